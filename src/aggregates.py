@@ -0,0 +1,285 @@
+"""Single pass aggregation engine, computes the counts and sums behind every KPI of
+the dashboard tabs from the categorical codes"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+import utils
+
+### categorical columns counted jointly, every KPI is a marginal of their joint counts
+DIMENSIONS = [
+    "Gender",
+    "Department",
+    "JobRole",
+    "MaritalStatus",
+    "Attrition",
+    "OverTime",
+    "ToBePromoted",
+    "ToBeRetrenched",
+    "WorkplaceProximity",
+    "JobSatisfaction",
+    "Ages",
+    "WorkExperience",
+    "PctAtCompanyRange",
+]
+### numeric columns summed for each joint cell, to derive means
+MEASURES = [
+    "MonthlyIncome",
+    "PercentSalaryHike",
+    "TotalWorkingYears",
+    "YearsAtCompany",
+    "TrainingTimesLastYear",
+    "YearsWithCurrManager",
+]
+### categorical filter columns added to the cube. The numeric (range) filter columns
+### are left out, one cell per value would make the cube grow with the headcount.
+CUBE_DIMENSIONS = ["EducationField"]
+# dense bincount up to this many cells per row, sparse (hash based) cells beyond
+__DENSE_CELLS_PER_ROW = 8
+# cubes of the current and the previous dataset version, the previous one is the
+# base of an incremental update
+__CUBES = OrderedDict()
+__CUBES_LOCK = threading.Lock()
+__MAX_CUBES = 2
+# cubes built from all rows and derived from the previous version's cube
+__CUBE_STATS = {"built": 0, "merged": 0}
+# one cube build at a time, a concurrent caller (e.g. the warm-up) waits for it
+__BUILD_LOCK = threading.Lock()
+
+
+@dataclass
+class Aggregates:
+    """Non-empty cells of the joint distribution of the dimensions, with the number
+    of employees and the measure sums in each cell. Codes are shifted by one, code 0
+    stands for a missing value."""
+
+    dims: List[str]
+    categories: List[pd.Index]
+    codes: List[np.ndarray]
+    counts: np.ndarray
+    sums: dict
+
+    @property
+    def total(self) -> int:
+        """Total number of employees"""
+        return int(self.counts.sum())
+
+    def count(self, *dims, where: dict = None) -> pd.Series:
+        """Number of employees by the given dimensions (non-empty groups only, like
+        groupby(observed=True).size()), optionally only where dim == value. Without
+        dimensions the overall number is returned."""
+        return self.__marginal(self.counts, dims, where)
+
+    def sum(self, measure: str, *dims, where: dict = None) -> pd.Series:
+        """Sum of the measure by the given dimensions, optionally only where
+        dim == value"""
+        return self.__marginal(self.sums[measure], dims, where, keep=self.counts)
+
+    def mean(self, measure: str, *dims, where: dict = None) -> pd.Series:
+        """Mean of the measure by the given dimensions"""
+        return self.sum(measure, *dims, where=where) / self.count(*dims, where=where)
+
+    def slice(self, filters) -> "Aggregates":
+        """Cells matching all filters, each filter is (dim, values) of a categorical
+        dim of the cells"""
+        mask = np.ones(len(self.counts), dtype=bool)
+        for dim, values in filters:
+            i = self.dims.index(dim)
+            selected = self.categories[i].get_indexer(list(values)) + 1
+            mask &= np.isin(self.codes[i], selected[selected > 0])
+        return Aggregates(
+            self.dims,
+            self.categories,
+            [codes[mask] for codes in self.codes],
+            self.counts[mask],
+            {measure: sums[mask] for measure, sums in self.sums.items()},
+        )
+
+    def __marginal(self, values, dims, where, keep=None):
+        keep = values if keep is None else keep
+        mask = keep > 0
+        for dim, value in (where or {}).items():
+            i = self.dims.index(dim)
+            categories = self.categories[i]
+            code = categories.get_loc(value) + 1 if value in categories else -1
+            mask &= self.codes[i] == code
+        idx = [self.dims.index(dim) for dim in dims]
+        for i in idx:
+            mask &= self.codes[i] > 0
+        if not idx:
+            return values[mask].sum()
+        shape = tuple(len(self.categories[i]) for i in idx)
+        keys = np.ravel_multi_index(tuple(self.codes[i][mask] - 1 for i in idx), shape)
+        size = int(np.prod(shape))
+        totals = np.bincount(keys, weights=values[mask], minlength=size)
+        present = np.bincount(keys, weights=keep[mask], minlength=size) > 0
+        if len(idx) == 1:
+            index = self.categories[idx[0]]
+        else:
+            index = pd.MultiIndex.from_product(
+                [self.categories[i] for i in idx], names=list(dims)
+            )
+        series = pd.Series(totals, index=index)[present]
+        series.index.names = list(dims)
+        if np.issubdtype(values.dtype, np.integer):
+            series = series.astype("int64")
+        return series
+
+
+def compute(df: DataFrame, dims=DIMENSIONS, measures=MEASURES) -> Aggregates:
+    """Aggregate the frame in one pass: the codes of all dimensions are combined into a
+    single cell key per row, counted with one bincount, and each measure is summed
+    per cell with one weighted bincount"""
+    categories, codes = zip(*(__dim_codes(df[dim]) for dim in dims))
+    shape = tuple(len(c) + 1 for c in categories)
+    keys = np.ravel_multi_index(codes, shape)
+    size = int(np.prod(shape))
+    if size <= max(len(df), 1) * __DENSE_CELLS_PER_ROW:
+        dense = np.bincount(keys, minlength=size)
+        cells = np.flatnonzero(dense)
+        counts = dense[cells]
+        sums = {
+            m: np.bincount(keys, weights=df[m].to_numpy(), minlength=size)[cells]
+            for m in measures
+        }
+    else:
+        # hash based, unlike np.unique it doesn't sort all the rows
+        inverse, cells = pd.factorize(keys)
+        counts = np.bincount(inverse, minlength=len(cells))
+        sums = {
+            m: np.bincount(inverse, weights=df[m].to_numpy(), minlength=len(cells))
+            for m in measures
+        }
+    codes = list(np.unravel_index(cells, shape))
+    return Aggregates(list(dims), list(categories), codes, counts, sums)
+
+
+def share(values: pd.Series, *levels: str) -> pd.Series:
+    """Percentage of each value within its group of values having the same labels in
+    the given index levels, or within all values if no level is given. Group totals
+    are broadcast back with one vectorized transform('sum'), so the cost doesn't grow
+    with the number of groups."""
+    if not levels:
+        return values / values.sum() * 100
+    totals = values.groupby(level=list(levels), sort=False, observed=True).transform(
+        "sum"
+    )
+    return values / totals * 100
+
+
+def slice_cube(df: DataFrame, df_filtered: DataFrame) -> Aggregates:
+    """KPI aggregates of the rows returned by filters.apply(df), sliced from the
+    dataset version's cube of all KPI and categorical filter dimensions instead of
+    filtering and aggregating rows, the cost depends on the number of cube cells only.
+    Range filters aren't in the cube, their rows are aggregated in one pass."""
+    # canonical filters, set by filters.apply on the frames it filtered
+    filters = df_filtered.attrs.get("filters", ())
+    cube = __get_cube(df)
+    if all(dim in cube.dims for dim, _ in filters):
+        return cube.slice(filters)
+    return compute(df_filtered)
+
+
+def update_cube(
+    prev_version: str,
+    version: str,
+    df: DataFrame,
+    added: DataFrame,
+    removed: DataFrame = None,
+):
+    """Derives the cube of the new dataset version df from the previous version's
+    cube, as counts and sums are additive: the cells of the added rows are added and
+    those of the removed rows subtracted. If the previous cube wasn't built, the new
+    one is built from all rows on first use instead."""
+    with __CUBES_LOCK:
+        prev = __CUBES.get(prev_version)
+    if prev is None:
+        return
+    parts = [(prev, 1), (compute(added, dims=prev.dims), 1)]
+    if removed is not None and len(removed):
+        parts.append((compute(removed, dims=prev.dims), -1))
+    categories = [__dim_codes(df[dim])[0] for dim in prev.dims]
+    __store_cube(version, __merge(parts, categories), "merged")
+
+
+def get_cube_stats() -> dict:
+    """Cubes kept, with the number of cells of each, and how many were built from
+    all rows or merged by update_cube"""
+    with __CUBES_LOCK:
+        cells = {version: len(cube.counts) for version, cube in __CUBES.items()}
+        return dict(__CUBE_STATS, cells=cells)
+
+
+### module's internal functions
+def __get_cube(df: DataFrame) -> Aggregates:
+    """Cube of all KPI and categorical filter dimensions, built once per dataset
+    version unless derived from the previous version's cube by update_cube"""
+    version = df.attrs["version"]
+    with __CUBES_LOCK:
+        cube = __CUBES.get(version)
+    if cube is not None:
+        return cube
+    with utils.spinner("Aggregating data..."), __BUILD_LOCK:
+        with __CUBES_LOCK:
+            cube = __CUBES.get(version)
+        if cube is None:
+            cube = compute(df, dims=DIMENSIONS + CUBE_DIMENSIONS)
+            __store_cube(version, cube, "built")
+    return cube
+
+
+def __store_cube(version: str, cube: Aggregates, how: str):
+    with __CUBES_LOCK:
+        __CUBE_STATS[how] += 1
+        __CUBES[version] = cube
+        __CUBES.move_to_end(version)
+        while len(__CUBES) > __MAX_CUBES:
+            __CUBES.popitem(last=False)
+
+
+def __merge(parts, categories: List[pd.Index]) -> Aggregates:
+    """Sum of the (aggregates, sign) parts over the same dimensions, their codes are
+    mapped to the given categories first. Cells left empty are dropped."""
+    agg = parts[0][0]
+    shape = tuple(len(c) + 1 for c in categories)
+    keys, counts = [], []
+    sums = {measure: [] for measure in agg.sums}
+    for part, sign in parts:
+        codes = [
+            # code 0 (missing) stays 0, as do categories no longer in use
+            np.concatenate([[0], target.get_indexer(source) + 1])[part_codes]
+            for source, target, part_codes in zip(
+                part.categories, categories, part.codes
+            )
+        ]
+        keys.append(np.ravel_multi_index(codes, shape))
+        counts.append(sign * part.counts)
+        for measure in sums:
+            sums[measure].append(sign * part.sums[measure])
+    inverse, cells = pd.factorize(np.concatenate(keys))
+    total = np.bincount(inverse, weights=np.concatenate(counts), minlength=len(cells))
+    present = total.round() > 0
+    return Aggregates(
+        list(agg.dims),
+        list(categories),
+        list(np.unravel_index(cells[present], shape)),
+        total[present].round().astype(np.int64),
+        {
+            measure: np.bincount(
+                inverse, weights=np.concatenate(values), minlength=len(cells)
+            )[present]
+            for measure, values in sums.items()
+        },
+    )
+
+
+def __dim_codes(column: pd.Series):
+    """Categories and codes (shifted by one, 0 is missing) of a categorical dimension
+    column"""
+    return column.cat.categories, column.cat.codes.to_numpy().astype(np.int64) + 1
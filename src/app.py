@@ -1,12 +1,15 @@
 """Application entry point, global configuration, application structure"""
 
-from config import app_config  
+from config import app_config
+import aggregates
 import data
+import plots
 import tab_capacity
 import tab_summary
 import tab_attrition
 import utils
 import filters
+import warmup  # starts the warm-up of the caches, once per server process
 
 import streamlit as st
 
@@ -15,22 +18,40 @@ def main():
     ### setup app-wide configuration
     utils.setup_app(app_config)
 
-    ### load data
-    df_hr = data.load_transform(app_config.data_file)
+    ### load data, shared across all sessions until the file changes
+    df_hr = data.load_transform_cached(app_config.data_file)
 
     ### apply session specific active filters
-    df_hr = filters.apply(df_hr)
+    df_filtered = filters.apply(df_hr)
+
+    ### KPIs of all tabs, sliced from the pre-aggregated cube
+    kpis = aggregates.slice_cube(df_hr, df_filtered)
+    df_hr = df_filtered
 
     ### setup app structure
-    exec_summary, capacity_analysis, attrition_analysis = utils.create_tabs(
-        ["EXECUTIVE SUMMARY 📝", "CAPACITY ANALYSIS 🚀", "ATTRITION ANALYSIS 🏃‍♂️"]
-    )
-    with exec_summary:
-        tab_summary.render(df_hr)
-    with capacity_analysis:
-        tab_capacity.render(df_hr)
-    with attrition_analysis:
-        tab_attrition.render(df_hr)
+    tabs = {
+        "EXECUTIVE SUMMARY 📝": tab_summary.render,
+        "CAPACITY ANALYSIS 🚀": tab_capacity.render,
+        "ATTRITION ANALYSIS 🏃‍♂️": tab_attrition.render,
+    }
+    if app_config.lazy_tabs:
+        ### compute and render the selected tab only, others are built on selection
+        render = tabs[utils.select_tab(list(tabs))]
+        render(df_hr, kpis)
+    else:
+        for tab, render in zip(utils.create_tabs(list(tabs)), tabs.values()):
+            with tab:
+                render(df_hr, kpis)
+
+    utils.show_perf_stats("data load", data.get_load_stats(app_config.data_file))
+    utils.show_perf_stats("aggregate cube", aggregates.get_cube_stats())
+    utils.show_perf_stats("filter cache", filters.get_cache_stats())
+    utils.show_perf_stats("figure cache", plots.get_cache_stats())
+    utils.show_perf_stats("figure payload bytes", utils.pop_payload_stats())
+
+    ### progress of the warm-up started when warmup was imported
+    if app_config.warm_up:
+        utils.show_perf_stats("warm-up (ms)", warmup.get_timings())
 
 
 if __name__ == "__main__":
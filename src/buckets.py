@@ -0,0 +1,92 @@
+"""Bucketing of numeric columns into labelled ranges. Bin edges are declared here
+explicitly instead of being derived from each dataset's min/max, so buckets are the
+same for every dataset, chunk and incremental load."""
+
+from typing import NamedTuple, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas import CategoricalDtype
+
+
+class Bucketing(NamedTuple):
+    """Buckets of a numeric column. Each bucket includes its upper edge, i.e. bucket i
+    holds the values in (edges[i-1], edges[i]]. With one label more than edges the
+    last bucket is open ended, else values above the last edge get no bucket."""
+
+    column: str
+    edges: Tuple[float, ...]
+    labels: Tuple[str, ...]
+
+
+### bump BUCKETS_VERSION whenever an edge or label below changes
+BUCKETS_VERSION = 2
+### bucket column name -> bucketing of its source column
+BUCKETS = {
+    ## WorkExperience - TotalWorkingYears in 5 yrs steps
+    "WorkExperience": Bucketing(
+        "TotalWorkingYears",
+        edges=(5, 10, 15, 20, 25, 30, 35),
+        labels=(
+            "5 Yrs",
+            "10 Yrs",
+            "15 Yrs",
+            "20 Yrs",
+            "25 Yrs",
+            "30 Yrs",
+            "35 Yrs",
+            "40 Yrs",
+        ),
+    ),
+    ## Ages - Age 18-60 in 7 yrs steps
+    "Ages": Bucketing(
+        "Age",
+        edges=(24, 31, 38, 45, 52),
+        labels=(
+            "18-24 Yrs",
+            "25-31 Yrs",
+            "32-38 Yrs",
+            "39-45 Yrs",
+            "46-52 Yrs",
+            "53-60 Yrs",
+        ),
+    ),
+    ## WorkplaceProximity - DistanceFromHome
+    # 1-10: Very Far, 11-19: Far, 20-29: Near
+    "WorkplaceProximity": Bucketing(
+        "DistanceFromHome",
+        edges=(10, 19),
+        labels=("Very Far", "Far", "Near"),
+    ),
+    ## PctAtCompanyRange - share of the work experience spent at the company
+    "PctAtCompanyRange": Bucketing(
+        "PctAtCompany",
+        edges=(25, 50, 75, 100),
+        labels=(
+            "between 0-25%",
+            "between 26-50%",
+            "between 51-75%",
+            "between 76-100%",
+        ),
+    ),
+}
+
+
+def codes(values, bucketing: Bucketing) -> np.ndarray:
+    """Bucket code of each value, -1 for missing values and values beyond the last
+    bucket"""
+    values = np.asarray(values, dtype="float64")
+    edges = np.asarray(bucketing.edges, dtype="float64")
+    codes = np.searchsorted(edges, values, side="left").astype("int8")
+    codes[np.isnan(values) | (codes >= len(bucketing.labels))] = -1
+    return codes
+
+
+def cut(values, bucketing: Bucketing) -> pd.Categorical:
+    """Bucket the values into an ordered categorical of the bucket labels"""
+    return pd.Categorical.from_codes(codes(values, bucketing), dtype=dtype(bucketing))
+
+
+def dtype(bucketing: Bucketing) -> CategoricalDtype:
+    """Ordered categorical dtype of the bucket labels"""
+    return CategoricalDtype(list(bucketing.labels), ordered=True)
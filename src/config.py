@@ -3,7 +3,7 @@
 import os
 from dataclasses import dataclass
 
-import plotly.express as px
+from plotly import colors
 
 
 ### define all app-wide configuration here, should not be accessed directly hence leading "__"
@@ -16,10 +16,10 @@ class __PlotConfig:
     #  'plotly_white', 'plotly_dark', 'presentation',
     #  'xgridoff', 'ygridoff', 'gridon', 'none']
     theme = "plotly_dark"
-    cat_color_map = px.colors.qualitative.T10
-    cat_color_map_r = px.colors.qualitative.T10_r
-    cont_color_map = px.colors.sequential.amp
-    cont_color_map_r = px.colors.sequential.amp_r
+    cat_color_map = colors.qualitative.T10
+    cat_color_map_r = colors.qualitative.T10_r
+    cont_color_map = colors.sequential.amp
+    cont_color_map_r = colors.sequential.amp_r
 
 
 ### define all app-wide configuration here, should not be accessed directly hence leading "__"
@@ -33,6 +33,35 @@ class __AppConfig:
     icon = f"{cwd}/assets/hr-banner.png"
     app_title = "Dashboard - Capacity Management"
     data_file = f"{cwd}/input_data/raw_hr_data.csv"
+    # "pyarrow" parses multi-threaded, "c" is the pandas default parser
+    csv_engine = "pyarrow"
+    # stream the csv in chunks of this many rows, None reads it in one go
+    csv_chunksize = None
+    # transformed data snapshots, rebuilt automatically when data_file changes
+    snapshot_dir = f"{cwd}/snapshot_data"
+    # dataset exports built for download, reused until the data changes
+    download_dir = f"{cwd}/download_data"
+    # disk budget of the exports, least recently used ones are deleted beyond it
+    download_cache_bytes = 512 * 1024**2
+    # rows written per chunk when exporting
+    download_chunk_rows = 100_000
+    # memory budget of the filtered frames shared by all sessions
+    filter_cache_bytes = 256 * 1024**2
+    # memory budget of the plotly figure specs shared by all sessions
+    figure_cache_bytes = 64 * 1024**2
+    # row-level scatter plots switch to WebGL markers above this many rows
+    scatter_webgl_rows = 1000
+    # and to a heatmap of server-side bins above this many rows
+    scatter_binned_rows = 50_000
+    # decimals kept of the floats sent to the browser in plotly figures
+    figure_float_decimals = 3
+    # show cache/timing counters in the sidebar
+    show_perf_stats = False
+    # load the data and build the filter index, cube, banner and figures of all tabs
+    # for the unfiltered view in a background thread, once per server process
+    warm_up = True
+    # render only the selected tab on each rerun instead of all tabs
+    lazy_tabs = True
     sidebar_state = "expanded"
     layout = "wide"
     icon_question = "❓"
@@ -1,126 +1,181 @@
 """All app-specific data and disk-IO related functionality implemented here"""
 
+import hashlib
+import io
+import os
+from typing import NamedTuple
+
+import numpy as np
 import pandas as pd
-import streamlit as st
+import pyarrow as pa
 from pandas import DataFrame
-
-
-def load_transform(file) -> DataFrame:
-    """Load the raw data and prepare/transform it"""
+from pandas.api.types import union_categoricals
+
+import aggregates
+import buckets
+import rules
+import utils
+from aggregates import Aggregates, share
+from config import app_config
+
+# bump whenever load_transform changes its output, invalidates existing snapshots
+TRANSFORM_VERSION = 4
+
+### declared schema, strings are loaded as categoricals and integers are downcast
+### to the smallest type that holds their values
+CATEGORY_COLUMNS = [
+    "Attrition",
+    "BusinessTravel",
+    "Department",
+    "EducationField",
+    "Gender",
+    "JobRole",
+    "MaritalStatus",
+    "Over18",
+    "OverTime",
+]
+INTEGER_COLUMNS = [
+    "Age",
+    "DailyRate",
+    "DistanceFromHome",
+    "Education",
+    "EmployeeCount",
+    "EmployeeNumber",
+    "EnvironmentSatisfaction",
+    "HourlyRate",
+    "JobInvolvement",
+    "JobLevel",
+    "JobSatisfaction",
+    "MonthlyIncome",
+    "MonthlyRate",
+    "NumCompaniesWorked",
+    "PercentSalaryHike",
+    "PerformanceRating",
+    "RelationshipSatisfaction",
+    "StandardHours",
+    "StockOptionLevel",
+    "TotalWorkingYears",
+    "TrainingTimesLastYear",
+    "WorkLifeBalance",
+    "YearsAtCompany",
+    "YearsInCurrentRole",
+    "YearsSinceLastPromotion",
+    "YearsWithCurrManager",
+]
+
+### column manifest, the raw columns actually read by the dashboard grouped by their
+### consumer, any other column in the raw file is never parsed
+COLUMN_MANIFEST = {
+    "key": ["EmployeeNumber"],
+    "filters": [
+        "Gender",
+        "Department",
+        "EducationField",
+        "JobRole",
+        "Age",
+        "YearsAtCompany",
+    ],
+    "feature_engineering": [
+        "Attrition",
+        "DistanceFromHome",
+        "JobSatisfaction",
+        "PerformanceRating",
+        "TotalWorkingYears",
+        "YearsInCurrentRole",
+        "YearsSinceLastPromotion",
+    ],
+    "tab_summary": [
+        "MaritalStatus",
+        "MonthlyIncome",
+        "OverTime",
+        "PercentSalaryHike",
+        "TrainingTimesLastYear",
+        "YearsWithCurrManager",
+    ],
+}
+USED_COLUMNS = sorted({col for cols in COLUMN_MANIFEST.values() for col in cols})
+
+# the raw columns read and their declared schema, part of the snapshot key
+__MANIFEST_DIGEST = hashlib.sha1(
+    repr(
+        (USED_COLUMNS, CATEGORY_COLUMNS, INTEGER_COLUMNS, app_config.csv_engine)
+    ).encode()
+).hexdigest()
+
+YES_NO = pd.CategoricalDtype(["No", "Yes"])
+JOB_SATISFACTION = pd.CategoricalDtype(
+    ["Very Dissatisfied", "Dissatisfied", "Neutral", "Satisfied"], ordered=True
+)
+
+
+class Fingerprint(NamedTuple):
+    """Identifies one version of a data file on disk"""
+
+    path: str
+    size: int
+    mtime_ns: int
+    digest: str
+
+
+def get_fingerprint(file: str) -> Fingerprint:
+    """Fingerprint the file by its path, size, modification time and content hash"""
+    stat = os.stat(file)
+    digest = __file_digest(os.path.abspath(file), stat.st_size, stat.st_mtime_ns)
+    return Fingerprint(os.path.abspath(file), stat.st_size, stat.st_mtime_ns, digest)
+
+
+def load_transform_cached(file: str) -> DataFrame:
+    """Load and transform the data once per file version. The transformed frame is
+    shared by all sessions, hence must be treated as read-only by the callers. It's
+    dropped and rebuilt automatically as soon as the file changes on disk."""
+    fingerprint = get_fingerprint(file)
+    return __load_transform_shared(file, fingerprint)
+
+
+def get_load_stats(file: str) -> dict:
+    """How the loaded version of the data file was produced (snapshot, full,
+    appended or changed) and the number of rows transformed for it"""
+    return dict(__LOAD_STATS.get(os.path.abspath(file), {}))
+
+
+def load_transform(file, chunksize: int = None) -> DataFrame:
+    """Load the raw data and prepare/transform it. If chunksize is given the file is
+    streamed in chunks of that many rows, each chunk is transformed and compacted
+    before the next one is read so peak memory doesn't grow with the raw file size."""
+    if chunksize:
+        return __load_transform_chunked(file, chunksize)
     ###
     ### Read raw data
     ###
-
-    df = pd.read_csv(file)
+    df = __read_raw(file)
 
     ###
     ### Handle missing data (None in this case)
     ###
 
-    ###
-    ### Feature Engineering
-    ###
-    ## Create a new column - ToBePromoted
-    # if yrs since last promotion >= 10 yrs and performance rating is > 2
-    # then promote else not to be promoted
-    df.loc[
-        (
-            (df["YearsSinceLastPromotion"] >= 10) & (df["PerformanceRating"] > 2),
-            "ToBePromoted",
-        )
-    ] = "Yes"
-    df["ToBePromoted"].fillna("No", inplace=True)
-
-    ## Create a new column - ToBeRetrenched
-    # 1) If years in current-role is between 3 to 10 years and performance-rating == 1
-    # 2) If years in current-role is >= 10 years and performance-rating < 3
-    # 3) Not-to-be-promoted or left the company
-    df.loc[
-        df.query(
-            "(YearsInCurrentRole >= 10 and PerformanceRating < 3) or "
-            + "(2 < YearsInCurrentRole < 10 and PerformanceRating == 1) "
-            + "and Attrition=='No' and ToBePromoted=='No'"
-        ).index,
-        "ToBeRetrenched",
-    ] = "Yes"
-    df["ToBeRetrenched"].fillna("No", inplace=True)
-
-    ## Create a new column - WorkExperience
-    # to divide TotalWorkExperience into bins, to be used in viz
-    df["WorkExperience"] = pd.cut(
-        df["TotalWorkingYears"],
-        bins=8,
-        labels=[
-            "5 Yrs",
-            "10 Yrs",
-            "15 Yrs",
-            "20 Yrs",
-            "25 Yrs",
-            "30 Yrs",
-            "35 Yrs",
-            "40 Yrs",
-        ],
-    )
-
-    ## Create a new column - Ages
-    # to divide Age into bins, to be used in viz
-    df["Ages"] = pd.cut(
-        df["Age"],
-        bins=6,
-        labels=[
-            "18-24 Yrs",
-            "25-31 Yrs",
-            "32-38 Yrs",
-            "39-45 Yrs",
-            "46-52 Yrs",
-            "53-60 Yrs",
-        ],
-    )
-
-    ## Create a new column - WorkplaceProximity bucket DistanceFromHome
-    # to divide DistanceFromHome into bins, to be used in viz
-    # 1-10: Very Far, 11-20: Far, 12-29: Near
-    df["WorkplaceProximity"] = pd.cut(
-        df["DistanceFromHome"],
-        bins=3,
-        labels=["Very Far", "Far", "Near"],
-    )
-
-    ## Map JobSatisfaction numeric levels to descriptive labels
-    df["JobSatisfaction"] = df["JobSatisfaction"].map(
-        {1: "Very Dissatisfied", 2: "Dissatisfied", 3: "Neutral", 4: "Satisfied"}
-    )
+    return __transform(df)
 
-    ## Create a new column - %YrsAtCompany
-    df["PctAtCompany"] = (df["YearsAtCompany"] / df["TotalWorkingYears"]).fillna(
-        0
-    ) * 100
 
-    return df
-
-
-def get_dept_stats_df(df: DataFrame):
+def get_dept_stats_df(kpis: Aggregates):
     """Calculate various stats for each department and returns results in a DataFrame"""
     # Prepare a df with department as index and mean MonthlyIncome, mean PercentSalaryHike,
     # mean TotalWorkingYears, mean YearsAtCompany, mean TrainingTimesLastYear
-    df_dept = (
-        df.groupby("Department")[
-            [
+    df_dept = DataFrame(
+        {
+            measure: kpis.mean(measure, "Department")
+            for measure in [
                 "MonthlyIncome",
                 "PercentSalaryHike",
                 "TotalWorkingYears",
                 "YearsAtCompany",
                 "TrainingTimesLastYear",
             ]
-        ]
-        .mean()
-        .round(2)
-    )
+        }
+    ).round(2)
     # Prepare a df with department as index and total count of OverTime (Yes) for each dept
     df_ot = (
-        df.query("OverTime == 'Yes'")
-        .groupby("Department")["OverTime"]
-        .count()
+        kpis.count("Department", where={"OverTime": "Yes"})
+        .rename("OverTime")
         .to_frame()
     )
     # Join both df to create a single df --> this to be shown with pandas gradients
@@ -128,10 +183,10 @@ def get_dept_stats_df(df: DataFrame):
     return df_dept_stat
 
 
-def get_gender_count(df: DataFrame):
+def get_gender_count(kpis: Aggregates):
     """Calculates employee total count and for each gender,
     returns count and percentage as result"""
-    df_gender = df.groupby("Gender").size()
+    df_gender = kpis.count("Gender")
     male_emp_cnt = df_gender.get("Male", 0)
     female_emp_cnt = df_gender.get("Female", 0)
     tot_emp_cnt = male_emp_cnt + female_emp_cnt
@@ -140,102 +195,121 @@ def get_gender_count(df: DataFrame):
     return tot_emp_cnt, male_emp_cnt, female_emp_cnt, male_pct, female_pct
 
 
-def get_promo_count(df: DataFrame):
+def get_promo_count(kpis: Aggregates):
     """Calculates number of employees due for promotion,
     returns count and percentage as result"""
-    df_promo = df.groupby("ToBePromoted").size()
+    df_promo = kpis.count("ToBePromoted")
     promo_cnt = df_promo.get("Yes", 0)
     not_promo_cnt = df_promo.get("No", 0)
-    tot_emp_cnt, _, _, _, _ = get_gender_count(df)
+    tot_emp_cnt, _, _, _, _ = get_gender_count(kpis)
     promo_pct = round((promo_cnt / tot_emp_cnt) * 100, 2)
     not_promo_pct = round((not_promo_cnt / tot_emp_cnt) * 100, 2)
     return promo_cnt, not_promo_cnt, promo_pct, not_promo_pct
 
 
-def get_retrench_count(df: DataFrame):
+def get_retrench_count(kpis: Aggregates):
     """Calculates number of employees due for retrenchment,
     returns count and percentage as result"""
-    df_retrench = df.groupby("ToBeRetrenched").size()
+    df_retrench = kpis.count("ToBeRetrenched")
     retrench_cnt = df_retrench.get("Yes", 0)
     not_retrench_cnt = df_retrench.get("No", 0)
-    tot_emp_cnt, _, _, _, _ = get_gender_count(df)
+    tot_emp_cnt, _, _, _, _ = get_gender_count(kpis)
     retrench_pct = round((retrench_cnt / tot_emp_cnt) * 100, 2)
     not_retrench_pct = round((not_retrench_cnt / tot_emp_cnt) * 100, 2)
     return retrench_cnt, not_retrench_cnt, retrench_pct, not_retrench_pct
 
 
-def get_pct_at_cmp(df):
-    pct_at_cmp = {
-        "between 0-25%": len(df.query("PctAtCompany <= 25")) / len(df),
-        "between 26-50%": len(df.query("PctAtCompany > 25 and PctAtCompany <= 50"))
-        / len(df),
-        "between 51-75%": len(df.query("PctAtCompany > 50 and PctAtCompany <= 75"))
-        / len(df),
-        "between 76-100%": len(df.query("PctAtCompany > 75 and PctAtCompany <= 100"))
-        / len(df),
-    }
-    return pct_at_cmp
+def get_flag_count(kpis: Aggregates, flag: str):
+    """Number of employees for each value of a Yes/No flag, largest first"""
+    return (
+        kpis.count(flag)
+        .reindex(YES_NO.categories, fill_value=0)
+        .rename_axis(flag)
+        .sort_values(ascending=False)
+        .rename("count")
+        .to_frame()
+        .reset_index()
+    )
 
 
-def get_dept_retrench_pct(df):
-    # count number of employee by department & retrench flag (Yes, No)
-    df_group = df.groupby(["Department", "ToBeRetrenched"]).size()
-    # calculate the percentage of yes/no within each group
-    df_group = (
-        df_group.groupby(level=0, group_keys=False)
-        .apply(lambda x: x / x.sum() * 100)
-        .to_frame()
+def get_marital_status_count(kpis: Aggregates):
+    """Number of employees by marital status, smallest first"""
+    return (
+        kpis.count("MaritalStatus")
+        .rename("size")
         .reset_index()
-        .rename({0: "RetrenchPct"}, axis=1)
+        .sort_values(by="size", ascending=True)
     )
-    return df_group
 
 
-def get_dept_promo_pct(df):
-    # count number of employee by department & promote flag (Yes, No)
-    df_group = df.groupby(["Department", "ToBePromoted"]).size()
-    # calculate the percentage of yes/no within each group
-    df_group = (
-        df_group.groupby(level=0, group_keys=False)
-        .apply(lambda x: x / x.sum() * 100)
-        .to_frame()
+def get_dept_gender_count(kpis: Aggregates):
+    """Number of employees by department and gender"""
+    return kpis.count("Department", "Gender").rename("size").reset_index()
+
+
+def get_dept_curr_mgr_mean(kpis: Aggregates):
+    """Mean years with current manager by department, longest first"""
+    return (
+        kpis.mean("YearsWithCurrManager", "Department")
+        .rename("YearsWithCurrManager")
         .reset_index()
-        .rename({0: "PromotePct"}, axis=1)
+        .sort_values(by="YearsWithCurrManager", ascending=False)
     )
-    return df_group
+
+
+def get_work_exp_pct(kpis: Aggregates):
+    """Percentage of employees in each work experience bucket"""
+    return share(kpis.count("WorkExperience")).rename("size").reset_index()
+
+
+def get_pct_at_cmp(kpis: Aggregates):
+    """Fraction of employees in each PctAtCompany bucket"""
+    labels = buckets.BUCKETS["PctAtCompanyRange"].labels
+    counts = kpis.count("PctAtCompanyRange").reindex(labels, fill_value=0)
+    return (counts / kpis.total).to_dict()
+
+
+def get_dept_retrench_pct(kpis: Aggregates):
+    # count number of employee by department & retrench flag (Yes, No)
+    df_group = kpis.count("Department", "ToBeRetrenched")
+    # calculate the percentage of yes/no within each department
+    return share(df_group, "Department").rename("RetrenchPct").reset_index()
+
+
+def get_dept_promo_pct(kpis: Aggregates):
+    # count number of employee by department & promote flag (Yes, No)
+    df_group = kpis.count("Department", "ToBePromoted")
+    # calculate the percentage of yes/no within each department
+    return share(df_group, "Department").rename("PromotePct").reset_index()
 
 
 def get_filter_options(df, empty_filters=False):
     """Returns filter fields options to fill filter or clear filter fields"""
-    if empty_filters:
-        filter_opt = {
-            "Gender": [],
-            "Department": [],
-            "EducationField": [],
-            "JobRole": [],
-            "Age": [df["Age"].min(), df["Age"].max()],
-            "YearsAtCompany": [df["YearsAtCompany"].min(), df["YearsAtCompany"].max()],
-        }
-    else:
-        filter_opt = {
-            "Gender": df["Gender"].unique().tolist(),
-            "Department": df["Department"].unique().tolist(),
-            "EducationField": df["EducationField"].unique().tolist(),
-            "JobRole": df["JobRole"].unique().tolist(),
-            "Age": [df["Age"].min(), df["Age"].max()],
-            "YearsAtCompany": [df["YearsAtCompany"].min(), df["YearsAtCompany"].max()],
-        }
+    filter_opt = {}
+    for key, options in get_filter_catalog(df).items():
+        # categorical, list of values
+        if isinstance(options, dict):
+            filter_opt[key] = [] if empty_filters else list(options)
+        # numeric, min and max range
+        else:
+            filter_opt[key] = list(options)
     return filter_opt
 
 
-def get_attrition_stats(df):
+def get_filter_catalog(df) -> dict:
+    """Filter fields options computed once per dataset version: for categorical fields
+    each value (in order of appearance) with its employee count, for numeric fields
+    the min and max"""
+    return __filter_catalog(df.attrs["version"], df)
+
+
+def get_attrition_stats(kpis: Aggregates):
     """Computes and returns attrition related statistics"""
     attrition_stat = {}
-    df_attrition = df.query("Attrition == 'Yes'")
 
     ### overall attrition rate
-    tot_employee = len(df)
-    tot_attrition = len(df_attrition)
+    tot_employee = kpis.total
+    tot_attrition = kpis.count(where={"Attrition": "Yes"})
     attrition_rate = round(tot_attrition / tot_employee * 100, 2)
     attrition_stat["CompanyWide"] = {
         "Total Attrition": tot_attrition,
@@ -243,7 +317,7 @@ def get_attrition_stats(df):
     }
 
     ### attrition by gender
-    df_gender = __attrition_by_dimention(df=df_attrition, dimention="Gender")
+    df_gender = __attrition_by_dimention(kpis=kpis, dimention="Gender")
     for _, row in df_gender.iterrows():
         x = {}
         x["Total Attrition"] = row["Count"]
@@ -252,47 +326,360 @@ def get_attrition_stats(df):
 
     ### attrition by department
     attrition_stat["Department"] = __attrition_by_dimention(
-        df=df_attrition, dimention="Department"
+        kpis=kpis, dimention="Department"
     )
 
     ### attrition by distance to work
     attrition_stat["WorkplaceProximity"] = __attrition_by_dimention(
-        df=df_attrition, dimention="WorkplaceProximity"
+        kpis=kpis, dimention="WorkplaceProximity"
     )
 
     ### attrition by job-role
-    attrition_stat["JobRole"] = __attrition_by_dimention(
-        df=df_attrition, dimention="JobRole"
-    )
+    attrition_stat["JobRole"] = __attrition_by_dimention(kpis=kpis, dimention="JobRole")
 
     ### attrition by employee satisfaction
     attrition_stat["JobSatisfaction"] = __attrition_by_dimention(
-        df=df_attrition, dimention="JobSatisfaction"
+        kpis=kpis, dimention="JobSatisfaction"
     )
 
     ### attrition by age
-    attrition_stat["Ages"] = __attrition_by_dimention(df=df_attrition, dimention="Ages")
+    attrition_stat["Ages"] = __attrition_by_dimention(kpis=kpis, dimention="Ages")
 
     ### attrition by work exp
     attrition_stat["WorkExperience"] = __attrition_by_dimention(
-        df=df_attrition, dimention="WorkExperience"
+        kpis=kpis, dimention="WorkExperience"
     )
     return attrition_stat
 
 
-# do not cache, need to read file from disk
-def df_to_csv(file: str) -> bytes:
-    """Read file again and return as as a csv"""
-    df = pd.read_csv(file)
-    return df.to_csv(index=False).encode("utf-8")
+### Modules internal functions
+def __read_raw(file, **kwargs):
+    """Read the manifest columns of the raw data using the declared schema"""
+    df = pd.read_csv(
+        file,
+        usecols=USED_COLUMNS,
+        dtype={col: "category" for col in CATEGORY_COLUMNS if col in USED_COLUMNS},
+        engine=kwargs.pop("engine", app_config.csv_engine),
+        **kwargs,
+    )
+    if kwargs.get("chunksize"):
+        return map(__downcast, df)
+    return __downcast(df)
 
 
-### Modules internal functions
-def __attrition_by_dimention(df, dimention):
-    """Compute attrition count and % for given column in dataframe"""
-    tot_attrition = len(df)
-    df_attr = pd.DataFrame(
-        df.groupby(f"{dimention}").size().reset_index().rename({0: "Count"}, axis=1)
+def __downcast(df: DataFrame) -> DataFrame:
+    """Downcast integer columns to the smallest type that holds their values"""
+    for col in INTEGER_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], downcast="integer")
+    return df
+
+
+def __transform(df: DataFrame) -> DataFrame:
+    """Feature engineering on (a chunk of) the raw data, bucketing uses the fixed bin
+    edges of buckets.py so that chunks of the same file get identical buckets"""
+    ###
+    ### Feature Engineering
+    ###
+    ## Create new columns - ToBePromoted, ToBeRetrenched
+    # evaluated by the policy rules declared in rules.py
+    for flag, mask in rules.evaluate(df).items():
+        df[flag] = pd.Categorical.from_codes(mask.astype("int8"), dtype=YES_NO)
+
+    ## Create new columns - WorkExperience, Ages, WorkplaceProximity
+    # to divide TotalWorkingYears, Age and DistanceFromHome into bins, to be used in viz
+    for name in ["WorkExperience", "Ages", "WorkplaceProximity"]:
+        bucketing = buckets.BUCKETS[name]
+        df[name] = buckets.cut(df[bucketing.column], bucketing)
+
+    ## Map JobSatisfaction numeric levels to descriptive labels
+    df["JobSatisfaction"] = (
+        df["JobSatisfaction"]
+        .map({1: "Very Dissatisfied", 2: "Dissatisfied", 3: "Neutral", 4: "Satisfied"})
+        .astype(JOB_SATISFACTION)
     )
-    df_attr["% Attrition"] = (df_attr["Count"] / tot_attrition * 100).round(2)
+
+    ## Create a new column - %YrsAtCompany
+    df["PctAtCompany"] = (
+        (df["YearsAtCompany"] / df["TotalWorkingYears"]).fillna(0) * 100
+    ).astype("float32")
+
+    ## Create a new column - PctAtCompanyRange bucket PctAtCompany
+    bucketing = buckets.BUCKETS["PctAtCompanyRange"]
+    df["PctAtCompanyRange"] = buckets.cut(df[bucketing.column], bucketing)
+
+    return df
+
+
+def __load_transform_chunked(file, chunksize: int) -> DataFrame:
+    """Stream the file in chunks, bin edges are fixed so buckets match the in-memory
+    path"""
+    # pyarrow engine doesn't support chunked reads
+    chunks = [
+        __transform(chunk)
+        for chunk in __read_raw(file, chunksize=chunksize, engine="c")
+    ]
+    return __concat_chunks(chunks)
+
+
+def __concat_chunks(chunks: list) -> DataFrame:
+    """Concatenate transformed chunks column by column, categoricals are unioned
+    instead of being widened to object columns"""
+    columns = {}
+    for col in chunks[0].columns:
+        dtype = chunks[0][col].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            # sorted categories, same as read_csv infers them for the whole file
+            columns[col] = union_categoricals(
+                [chunk[col] for chunk in chunks], sort_categories=not dtype.ordered
+            )
+        else:
+            columns[col] = pd.concat(
+                [chunk[col] for chunk in chunks], ignore_index=True
+            )
+    return DataFrame(columns)
+
+
+@utils.shared_resource(max_entries=8)
+def __file_digest(path: str, size: int, mtime_ns: int) -> str:
+    """Hash the file content, only re-hashed when path, size or mtime changes"""
+    with open(path, "rb") as f:
+        return __hash_stream(f, size)
+
+
+def __hash_stream(f, size: int) -> str:
+    """Hash the next size bytes of a binary stream"""
+    sha = hashlib.sha256()
+    while size > 0:
+        block = f.read(min(size, 1 << 20))
+        if not block:
+            break
+        sha.update(block)
+        size -= len(block)
+    return sha.hexdigest()
+
+
+@utils.shared_resource(max_entries=2)
+def __filter_catalog(version: str, _df: DataFrame) -> dict:
+    """Scan each filter column once for the given dataset version"""
+    catalog = {}
+    for key in COLUMN_MANIFEST["filters"]:
+        column = _df[key]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            codes = column.cat.codes.to_numpy()
+            counts = np.bincount(
+                codes[codes >= 0], minlength=len(column.cat.categories)
+            )
+            catalog[key] = {
+                column.cat.categories[code]: int(counts[code])
+                for code in pd.unique(codes[codes >= 0])
+            }
+        else:
+            catalog[key] = (int(column.min()), int(column.max()))
+    return catalog
+
+
+# only the current file version is kept, a new fingerprint evicts the stale frame
+@utils.shared_resource(max_entries=1, show_spinner="Loading data...")
+def __load_transform_shared(file: str, fingerprint: Fingerprint) -> DataFrame:
+    """Process-wide shared copy of the transformed data for a given file version,
+    served from the on-disk snapshot when it's still fresh"""
+    snapshot = __snapshot_path(file)
+    df = __read_snapshot(snapshot, fingerprint)
+    if df is None:
+        df = __load_transform_incremental(file, fingerprint)
+        __write_snapshot(df, snapshot, fingerprint)
+    else:
+        __record_load(fingerprint, "snapshot", df, transformed=0)
+    df.attrs["version"] = fingerprint.digest
+    return df
+
+
+# process-wide record of the last version loaded for each data file, used as the base
+# for incremental ingest
+__INGEST_STATE = {}
+# data file path -> how its last version was loaded, see get_load_stats
+__LOAD_STATS = {}
+
+
+def __load_transform_incremental(file: str, fingerprint: Fingerprint) -> DataFrame:
+    """Transform only rows appended or changed since the previously loaded version of
+    the file and merge them into the previous frame. Falls back to a full rebuild when
+    there's no previous version (e.g. after a restart), when the schema changed, or
+    when rows can't be matched by EmployeeNumber."""
+    if app_config.csv_chunksize:
+        # streamed loads don't keep the row hashes needed to diff the next version
+        df = load_transform(file, chunksize=app_config.csv_chunksize)
+        __record_load(fingerprint, "full", df, transformed=len(df))
+        return df
+    prev = __INGEST_STATE.get(fingerprint.path)
+    result = None
+    if prev is not None:
+        result = __ingest_appended(file, fingerprint, prev)
+        mode = "appended"
+        if result is None:
+            result = __ingest_changed(file, prev)
+            mode = "changed"
+    if result is None:
+        raw = __read_raw(file)
+        hashes = __row_hashes(raw)
+        df = __transform(raw)
+        __record_load(fingerprint, "full", df, transformed=len(df))
+    else:
+        df, hashes, added, removed = result
+        __record_load(fingerprint, mode, df, transformed=len(added))
+        # the aggregates are additive, the delta is merged into the previous cube
+        aggregates.update_cube(
+            prev["fingerprint"].digest, fingerprint.digest, df, added, removed
+        )
+    __INGEST_STATE[fingerprint.path] = {
+        "fingerprint": fingerprint,
+        "df": df,
+        "hashes": hashes,
+    }
+    return df
+
+
+def __record_load(fingerprint: Fingerprint, mode: str, df: DataFrame, transformed: int):
+    __LOAD_STATS[fingerprint.path] = {
+        "mode": mode,
+        "rows": len(df),
+        "transformed": transformed,
+    }
+
+
+def __ingest_appended(file: str, fingerprint: Fingerprint, prev: dict):
+    """Parse and transform only the bytes appended after the previous version of the
+    file. Returns the frame, row hashes and the added and removed (none) rows, or
+    None unless the file was purely appended with new employees."""
+    prev_fingerprint = prev["fingerprint"]
+    if fingerprint.size <= prev_fingerprint.size:
+        return None
+    with open(file, "rb") as f:
+        header = f.readline()
+        f.seek(0)
+        if __hash_stream(f, prev_fingerprint.size) != prev_fingerprint.digest:
+            return None
+        f.seek(prev_fingerprint.size - 1)
+        if f.read(1) != b"\n":
+            return None
+        tail = f.read()
+    raw = __read_raw(io.BytesIO(header + tail))
+    prev_df = prev["df"]
+    keys = raw["EmployeeNumber"]
+    # updates to existing employees need the full diff to keep file order
+    if keys.duplicated().any() or keys.isin(prev_df["EmployeeNumber"]).any():
+        return None
+    if not __same_schema(raw, prev_df):
+        return None
+    hashes = np.concatenate([prev["hashes"], __row_hashes(raw)])
+    added = __transform(raw)
+    df = __concat_chunks([prev_df, added])
+    return df, hashes, added, None
+
+
+def __ingest_changed(file: str, prev: dict):
+    """Re-parse the file but only transform rows that are new or whose raw values
+    changed, matched by EmployeeNumber. Returns the frame, row hashes and the added
+    and removed (changed or deleted) rows, or None if a full rebuild is needed."""
+    raw = __read_raw(file)
+    prev_df = prev["df"]
+    prev_keys = pd.Index(prev_df["EmployeeNumber"])
+    if not prev_keys.is_unique or raw["EmployeeNumber"].duplicated().any():
+        return None
+    if not __same_schema(raw, prev_df):
+        return None
+    hashes = __row_hashes(raw)
+    prev_pos = prev_keys.get_indexer(raw["EmployeeNumber"])
+    changed = (prev_pos == -1) | (prev["hashes"][prev_pos] != hashes)
+    kept = prev_df.take(prev_pos[~changed])
+    removed = np.ones(len(prev_df), dtype=bool)
+    removed[prev_pos[~changed]] = False
+    delta = __transform(raw[changed].copy())
+    df = __concat_chunks([kept, delta])
+    # restore the row order of the file
+    order = np.concatenate([np.flatnonzero(~changed), np.flatnonzero(changed)])
+    df = df.take(np.argsort(order, kind="stable")).reset_index(drop=True)
+    # drop categories only used by removed employees, as a full rebuild would
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].cat.remove_unused_categories()
+    return df, hashes, delta, prev_df[removed]
+
+
+def __row_hashes(raw: DataFrame):
+    """Hash of each raw row's values, independent of the downcast integer widths"""
+    ints = raw.select_dtypes("integer").columns
+    raw = raw.astype({col: "int64" for col in ints})
+    return pd.util.hash_pandas_object(raw, index=False).to_numpy()
+
+
+def __same_schema(raw: DataFrame, prev_df: DataFrame) -> bool:
+    """Raw columns and their kind of dtype match those of the previous version"""
+    return list(raw.columns) == [
+        c for c in prev_df.columns if c in USED_COLUMNS
+    ] and all(
+        isinstance(raw[col].dtype, pd.CategoricalDtype)
+        == isinstance(prev_df[col].dtype, pd.CategoricalDtype)
+        and raw[col].dtype.kind == prev_df[col].dtype.kind
+        for col in raw.columns
+        if col != "JobSatisfaction"  # mapped to labels by the transform
+    )
+
+
+def __snapshot_path(file: str) -> str:
+    """Snapshot file used for given raw data file"""
+    name = os.path.splitext(os.path.basename(file))[0]
+    return os.path.join(app_config.snapshot_dir, f"{name}.arrow")
+
+
+def __snapshot_key(fingerprint: Fingerprint) -> bytes:
+    """Identifies the source data, the columns read and how, and the transform that
+    produced a snapshot"""
+    version = f"{TRANSFORM_VERSION}.{buckets.BUCKETS_VERSION}"
+    return f"{fingerprint.digest}:{version}:{__MANIFEST_DIGEST}".encode()
+
+
+def __read_snapshot(path: str, fingerprint: Fingerprint):
+    """Memory-map the snapshot, returns None if it's missing, stale or unreadable"""
+    try:
+        reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+        metadata = reader.schema.metadata or {}
+        if metadata.get(b"source_fingerprint") != __snapshot_key(fingerprint):
+            return None
+        return reader.read_all().to_pandas(split_blocks=True)
+    except (OSError, pa.ArrowException):
+        return None
+
+
+def __write_snapshot(df: DataFrame, path: str, fingerprint: Fingerprint):
+    """Persist the transformed data as an uncompressed Arrow IPC file (so it can be
+    memory-mapped) tagged with the source fingerprint. The snapshot is only an
+    optimization, failing to write it must not fail the app."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata(
+            {
+                **table.schema.metadata,
+                b"source_fingerprint": __snapshot_key(fingerprint),
+            }
+        )
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        # atomic swap, readers never see a partially written snapshot
+        os.replace(tmp_path, path)
+    except (OSError, pa.ArrowException):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def __attrition_by_dimention(kpis, dimention):
+    """Compute attrition count and % for given dimension"""
+    counts = kpis.count(dimention, where={"Attrition": "Yes"})
+    df_attr = pd.DataFrame(
+        {"Count": counts, "% Attrition": share(counts).round(2)}
+    ).reset_index()
     return df_attr.sort_values(by="% Attrition", ascending=False)
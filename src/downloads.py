@@ -0,0 +1,124 @@
+"""Dataset exports for download, built on request in chunks into files on disk and
+reused until the data changes"""
+
+import gzip
+import hashlib
+import os
+import shutil
+import threading
+
+import pyarrow as pa
+import pyarrow.csv
+import pyarrow.parquet as pq
+from pandas import DataFrame
+
+import data
+from config import app_config
+
+### download format -> file extension, mime type
+FORMATS = {
+    "CSV": (".csv", "text/csv"),
+    "CSV (gzip)": (".csv.gz", "application/gzip"),
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+
+
+def export_raw(file: str, fmt: str) -> str:
+    """Path of the raw data file in the given format, built once per file version"""
+    if fmt == "CSV":
+        # nothing to convert, the raw file itself is downloaded
+        return file
+    fingerprint = data.get_fingerprint(file)
+    path = __export_path(("raw", fingerprint.digest), fmt)
+    writer = __raw_to_gzip if fmt == "CSV (gzip)" else __raw_to_parquet
+    __build_once(path, lambda tmp_path: writer(file, tmp_path))
+    return path
+
+
+def export_rows(df: DataFrame, fmt: str) -> str:
+    """Path of the rows (as returned by filters.apply) in the given format, built
+    once per dataset version and filters"""
+    key = ("rows", df.attrs["version"], repr(df.attrs.get("filters", ())))
+    path = __export_path(key, fmt)
+    writer = __rows_to_parquet if fmt == "Parquet" else __rows_to_csv
+    __build_once(path, lambda tmp_path: writer(df, tmp_path, fmt))
+    return path
+
+
+### module's internal functions
+def __export_path(key: tuple, fmt: str) -> str:
+    """Export file used for given source key and format"""
+    name = hashlib.sha1(repr(key).encode()).hexdigest()
+    return os.path.join(app_config.download_dir, f"{name}{FORMATS[fmt][0]}")
+
+
+def __build_once(path: str, write):
+    """Write the export to a temporary file and swap it in, so a partially written
+    export is never served, unless it exists already. Old exports are pruned to the
+    disk budget."""
+    if os.path.exists(path):
+        # mark as recently used for pruning
+        os.utime(path)
+        return
+    # unique per writer, concurrent sessions may build the same export
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    __prune(keep=path)
+
+
+def __prune(keep: str):
+    """Delete the least recently used exports beyond the disk budget,
+    app_config.download_cache_bytes"""
+    entries = [
+        entry
+        for entry in os.scandir(app_config.download_dir)
+        if entry.is_file() and not entry.name.endswith(".tmp")
+    ]
+    entries.sort(key=lambda entry: entry.stat().st_mtime_ns, reverse=True)
+    total = 0
+    for entry in entries:
+        total += entry.stat().st_size
+        if total > app_config.download_cache_bytes and entry.path != keep:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass  # already removed by another session
+
+
+def __raw_to_gzip(file: str, tmp_path: str):
+    with open(file, "rb") as src, gzip.open(tmp_path, "wb") as dst:
+        shutil.copyfileobj(src, dst, 1024**2)
+
+
+def __raw_to_parquet(file: str, tmp_path: str):
+    # streamed one block of rows at a time
+    reader = pyarrow.csv.open_csv(file)
+    with pq.ParquetWriter(tmp_path, reader.schema) as writer:
+        for batch in reader:
+            writer.write_batch(batch)
+
+
+def __rows_to_csv(df: DataFrame, tmp_path: str, fmt: str):
+    opener = gzip.open if fmt == "CSV (gzip)" else open
+    chunk_rows = app_config.download_chunk_rows
+    with opener(tmp_path, "wt", newline="") as f:
+        for start in range(0, max(len(df), 1), chunk_rows):
+            chunk = df.iloc[start : start + chunk_rows]
+            chunk.to_csv(f, header=start == 0, index=False)
+
+
+def __rows_to_parquet(df: DataFrame, tmp_path: str, fmt: str):
+    chunk_rows = app_config.download_chunk_rows
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    with pq.ParquetWriter(tmp_path, schema) as writer:
+        for start in range(0, len(df), chunk_rows):
+            chunk = df.iloc[start : start + chunk_rows]
+            writer.write_table(
+                pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            )
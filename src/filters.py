@@ -1,12 +1,20 @@
 """handles dashboard filters"""
 
-import data
+import numpy as np
+import pandas as pd
 import streamlit as st
 
+import data
+import utils
+from config import app_config
+
 
 def apply(df):
-    """filters the dataframe using active filters and returns the filtered dataframe"""
-    ### get all filters elements to be build from the dataset
+    """filters the dataframe using active filters and returns the filtered dataframe.
+    A filtered frame carries the canonical filters it was built with in
+    attrs["filters"], a tuple of (column, values) for categorical and
+    (column, (min, max)) for numeric columns."""
+    ### get all filters elements to be build from the dataset's precomputed catalog
     filter_elem = data.get_filter_options(df)
     ### build the filter UI
     curr_filter_ui = __build_filter_ui(df, filter_elem)
@@ -28,11 +36,17 @@ def __build_filter_ui(df, filter_elem):
     curr_filter_ui = st.sidebar.expander("Current Active Filter:")
 
     ### build the UI
+    catalog = data.get_filter_catalog(df)
     for key, options in filter_elem.items():
         st.sidebar.markdown("---")
-        # if categorical variable
+        # if categorical variable, show employee count next to each value
         if isinstance(options[0], str):
-            st.sidebar.multiselect(key=key, label=key, options=options)
+            st.sidebar.multiselect(
+                key=key,
+                label=key,
+                options=options,
+                format_func=lambda value, key=key: f"{value} ({catalog[key][value]:,})",
+            )
         # if numeric variable
         else:
             st.sidebar.slider(
@@ -46,29 +60,132 @@ def __build_filter_ui(df, filter_elem):
 
 
 def __apply_filters(df, filter_elem, curr_filter_ui):
-    ### build the query
-    ### loop through filter elements and get its current value from session_state
-    ### and . Include the element only if its non-empty-list
-    filter = ""
+    ### loop through filter elements and get its current value from session_state,
+    ### include the element only if its non-empty-list
+    active_filters = {}
     for key, _ in filter_elem.items():
         elem = st.session_state[key]
         # non-empty
         if elem:
-            # if there are existing filters then append "and"
-            if filter:
-                filter += " and "
-            # check if string
-            if isinstance(elem[0], str):
-                filter += f"({key} == {elem})"
-            # else (numerical), it will have a min and max range
-            else:
-                filter += f"({elem[0]} <= {key} <= {elem[1]})"
+            active_filters[key] = elem
     # show filter in sidebar
     with curr_filter_ui:
-        filter_show = "<br>and".join(filter.split("and"))
+        filter_show = "<br>and".join(__describe_filters(active_filters).split("and"))
         st.markdown(
             f'<span style="color:#FBFAFA"><b><i>{filter_show}</i></b></span>',
             unsafe_allow_html=True,
         )
-    # return the filtered dataframe
-    return df.query(filter)
+    # return the filtered dataframe, shared by all sessions with the same filters
+    filter_index = get_filter_index(df)
+    key = (df.attrs["version"], __canonical_filters(filter_index, active_filters))
+    cache = __get_result_cache()
+    df_filtered = cache.get(key)
+    if df_filtered is None:
+        rows = __select_rows(filter_index, active_filters)
+        # nothing filtered out, the shared frame is already in memory
+        if rows is None:
+            df_filtered = df
+        else:
+            df_filtered = df.take(rows)
+            # canonical filters the frame was built with, see apply()
+            df_filtered.attrs["filters"] = key[1]
+            cache.put(key, df_filtered)
+    return df_filtered
+
+
+def get_filter_index(df):
+    """Filter index of the dataset version, built once per version, see
+    __get_filter_index"""
+    return __get_filter_index(df.attrs["version"], df)
+
+
+def get_cache_stats():
+    """Hit/miss counters and memory use of the filtered results cache"""
+    return __get_result_cache().stats()
+
+
+def __describe_filters(active_filters):
+    """Human readable form of the active filters"""
+    filter = []
+    for key, elem in active_filters.items():
+        # check if string
+        if isinstance(elem[0], str):
+            filter.append(f"({key} == {elem})")
+        # else (numerical), it will have a min and max range
+        else:
+            filter.append(f"({elem[0]} <= {key} <= {elem[1]})")
+    return " and ".join(filter)
+
+
+def __canonical_filters(filter_index, active_filters):
+    """Order independent, hashable form of the active filters. Unknown values and
+    numeric ranges covering all the data are dropped as they filter nothing."""
+    canonical = []
+    for key, elem in sorted(active_filters.items()):
+        if isinstance(elem[0], str):
+            values = tuple(sorted(set(elem) & filter_index[key].keys()))
+            canonical.append((key, values))
+        else:
+            sorted_values, _ = filter_index[key]
+            if len(sorted_values) and (
+                elem[0] > sorted_values[0] or elem[1] < sorted_values[-1]
+            ):
+                canonical.append((key, (int(elem[0]), int(elem[1]))))
+    return tuple(canonical)
+
+
+@st.cache_resource
+def __get_result_cache():
+    """Process-wide LRU cache of filtered frames, bounded by the app's memory budget"""
+    return utils.LRUCache(
+        max_bytes=app_config.filter_cache_bytes,
+        sizeof=lambda df: int(df.memory_usage(index=True).sum()),
+    )
+
+
+@utils.shared_resource(max_entries=2)
+def __get_filter_index(version, _df):
+    """Index the dataset version for filtering, a bitmap (packed boolean mask) per value
+    of each categorical column and a sorted index for each numeric column"""
+    filter_index = {"rows": len(_df)}
+    for key in data.get_filter_options(_df, empty_filters=True):
+        column = _df[key]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            codes = column.cat.codes.to_numpy()
+            filter_index[key] = {
+                value: np.packbits(codes == code)
+                for code, value in enumerate(column.cat.categories)
+            }
+        else:
+            values = column.to_numpy()
+            order = np.argsort(values, kind="stable")
+            filter_index[key] = (values[order], order)
+    return filter_index
+
+
+def __select_rows(filter_index, active_filters):
+    """Row positions matching all active filters, None if no filter excludes any row.
+    Bitmaps of the selected values are OR-ed, range filters are resolved by binary
+    search over the sorted index, then all filters are AND-ed together."""
+    n_rows = filter_index["rows"]
+    bits = None
+    for key, elem in active_filters.items():
+        if isinstance(elem[0], str):
+            key_bits = np.zeros((n_rows + 7) // 8, dtype=np.uint8)
+            for value in elem:
+                if value in filter_index[key]:
+                    key_bits |= filter_index[key][value]
+        else:
+            sorted_values, order = filter_index[key]
+            start = np.searchsorted(sorted_values, elem[0], side="left")
+            stop = np.searchsorted(sorted_values, elem[1], side="right")
+            # whole range selected, nothing to filter
+            if start == 0 and stop == n_rows:
+                continue
+            mask = np.zeros(n_rows, dtype=bool)
+            mask[order[start:stop]] = True
+            key_bits = np.packbits(mask)
+        bits = key_bits if bits is None else bits & key_bits
+    if bits is None:
+        return None
+    return np.flatnonzero(np.unpackbits(bits, count=n_rows))
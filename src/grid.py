@@ -0,0 +1,52 @@
+"""Server-side sorting and paging of the filtered rows, only the rows of the visible
+page are materialized and sent to the browser"""
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from pandas import DataFrame
+
+import data
+from config import app_config
+
+
+def get_page(
+    df: DataFrame, sort_by: str, ascending: bool, page: int, page_size: int
+) -> DataFrame:
+    """Rows of the page (0 based) of the frame returned by filters.apply, sorted by
+    the column. The sort order comes from a per dataset version sort index of all
+    rows, restricted to the filtered rows, so no per request sort is needed."""
+    shared = data.load_transform_cached(app_config.data_file)
+    if df.attrs.get("version") == shared.attrs["version"]:
+        order = __get_sort_index(shared.attrs["version"], sort_by, shared)
+        if df is not shared:
+            # the filtered frame keeps the positions of its rows in the shared frame
+            selected = np.zeros(len(shared), dtype=bool)
+            selected[df.index.to_numpy()] = True
+            order = order[selected[order]]
+        source = shared
+    else:
+        # the data changed since df was filtered, sort it directly
+        order = __argsort(df[sort_by])
+        source = df
+    if not ascending:
+        order = order[::-1]
+    return source.take(order[page * page_size : (page + 1) * page_size])
+
+
+### module's internal functions
+@st.cache_resource(max_entries=16, show_spinner=False)
+def __get_sort_index(version: str, column: str, _df: DataFrame) -> np.ndarray:
+    """Row positions of the dataset version ordered by the column"""
+    return __argsort(_df[column])
+
+
+def __argsort(column: pd.Series) -> np.ndarray:
+    """Stable argsort, categoricals by their category order, missing values last"""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        values = column.cat.codes.to_numpy().astype("int32")
+        values[values < 0] = len(column.cat.categories)
+    else:
+        values = column.to_numpy()
+    order = np.argsort(values, kind="stable")
+    return order.astype("int32") if len(order) < 2**31 else order
@@ -0,0 +1,66 @@
+"""Import time profile of the app, i.e. the cold start cost of a fresh worker
+process. The modules are imported in a new interpreter with python's -X importtime
+and the cost of each module and top-level package is reported."""
+
+import os
+import re
+import subprocess
+import sys
+from collections import Counter
+
+# "import time: self [us] | cumulative | <indent>module"
+__LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def profile(modules=("app",)) -> list:
+    """(module, self us, cumulative us, depth) of every module imported by a fresh
+    interpreter importing the given modules, in import order"""
+    code = "; ".join(f"import {module}" for module in modules)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=os.getcwd(),
+        env=dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        match = __LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            depth = (len(indent) - 1) // 2
+            entries.append((module, int(self_us), int(cumulative_us), depth))
+    return entries
+
+
+def report(entries: list, modules=("app",), top: int = 20):
+    """Prints the total import time of the profiled modules, their costliest
+    top-level packages (self time of all their modules) and the costliest modules
+    they import directly (cumulative time, i.e. with what these import)"""
+    packages = Counter()
+    direct = []
+    imported = []
+    # a module is reported after the modules it imports, interpreter start up
+    # modules are dropped
+    for module, self_us, cumulative_us, depth in entries:
+        imported.append((module, self_us, cumulative_us, depth))
+        if depth == 0:
+            if module in modules:
+                for name, us, _, _ in imported:
+                    packages[name.split(".")[0]] += us
+                direct.extend(entry for entry in imported if entry[3] == 1)
+            imported = []
+    print(f"total: {sum(packages.values()) / 1000:.1f} ms")
+    print(f"\ntop {top} packages (self time):")
+    for package, us in packages.most_common(top):
+        print(f"{us / 1000:10.1f} ms  {package}")
+    print(f"\ntop {top} directly imported modules (cumulative time):")
+    for module, _, cumulative_us, _ in sorted(direct, key=lambda e: -e[2])[:top]:
+        print(f"{cumulative_us / 1000:10.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    # usage: python src/importprofile.py [module ...]
+    modules = tuple(sys.argv[1:]) or ("app",)
+    report(profile(modules), modules)
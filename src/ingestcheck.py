@@ -0,0 +1,138 @@
+"""Equivalence check of the incremental ingest. A copy of the data file is edited as
+a data refresh would (employees appended, changed and deleted, every employee of one
+education field removed) and after each edit the frame loaded incrementally by
+data.load_transform_cached is compared with a full data.load_transform of the file,
+and the cube merged by aggregates.update_cube with aggregates.compute of all rows."""
+
+import os
+import shutil
+import sys
+import tempfile
+
+import pandas as pd
+
+import aggregates
+import data
+from config import app_config
+
+
+def run(file: str) -> list:
+    """(edit, load stats) of each edit of a copy of the file, raises AssertionError
+    if an incrementally loaded frame or cube differs from the full load or if the
+    edit wasn't ingested incrementally"""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        # no fresh snapshot may stand in for the ingest, nor may the app's be replaced
+        app_config.snapshot_dir = os.path.join(tmp, "snapshots")
+        copy = os.path.join(tmp, os.path.basename(file))
+        shutil.copy(file, copy)
+        results.append(("initial", check(copy, "full")))
+        for edit, mode in [
+            (__append, "appended"),
+            (__change_and_delete, "changed"),
+            (__drop_education_field, "changed"),
+        ]:
+            edit(copy)
+            results.append((edit.__name__.strip("_"), check(copy, mode)))
+    return results
+
+
+def check(file: str, mode: str) -> dict:
+    """Loads the file's current version and compares it and its cube with a full
+    load, returns the load stats"""
+    merged = aggregates.get_cube_stats()["merged"]
+    df = data.load_transform_cached(file)
+    stats = data.get_load_stats(file)
+    assert stats["mode"] == mode, f"loaded {stats['mode']}, expected {mode}"
+    # integer widths may differ, the incremental frame keeps those of the previous
+    # version where they still fit
+    pd.testing.assert_frame_equal(df, data.load_transform(file), check_dtype=False)
+    # the previous version's cube was merged with the delta while loading
+    cube = aggregates.slice_cube(df, df)
+    if mode != "full":
+        assert aggregates.get_cube_stats()["merged"] == merged + 1, "cube not merged"
+    __assert_same_aggregates(cube, aggregates.compute(df, dims=cube.dims))
+    return stats
+
+
+### module's internal functions
+def __assert_same_aggregates(got, expected):
+    """Same counts and measure sums by each dimension, alone and jointly with the
+    filter dimensions of the cube, and in a slice of the cube"""
+    for dim in expected.dims:
+        for dims in [(dim,)] + [
+            (dim, cube_dim)
+            for cube_dim in aggregates.CUBE_DIMENSIONS
+            if cube_dim != dim
+        ]:
+            pd.testing.assert_series_equal(got.count(*dims), expected.count(*dims))
+            for measure in expected.sums:
+                pd.testing.assert_series_equal(
+                    got.sum(measure, *dims),
+                    expected.sum(measure, *dims),
+                    check_exact=False,
+                )
+    filters = [
+        (dim, list(expected.categories[i][:2]))
+        for i, dim in enumerate(expected.dims[:2])
+    ]
+    pd.testing.assert_series_equal(
+        got.slice(filters).count("JobRole", "Attrition"),
+        expected.slice(filters).count("JobRole", "Attrition"),
+    )
+
+
+def __append(file: str):
+    """Three new employees, copies of the first ones with new EmployeeNumbers"""
+    header, rows = __read_rows(file)
+    key = header.index("EmployeeNumber")
+    last = max(int(row[key]) for row in rows)
+    added = [
+        row[:key] + [str(last + i + 1)] + row[key + 1 :]
+        for i, row in enumerate(rows[:3])
+    ]
+    __write_rows(file, added, mode="a")
+
+
+def __change_and_delete(file: str):
+    """Changes the values of an employee read by the policy rules, deletes another"""
+    header, rows = __read_rows(file)
+    rows[4][header.index("YearsInCurrentRole")] = "11"
+    rows[4][header.index("PerformanceRating")] = "1"
+    del rows[6]
+    __write_rows(file, [header] + rows)
+
+
+def __drop_education_field(file: str):
+    """Removes every employee of the least common education field"""
+    header, rows = __read_rows(file)
+    field = header.index("EducationField")
+    counts = pd.Series([row[field] for row in rows]).value_counts()
+    __write_rows(
+        file, [header] + [row for row in rows if row[field] != counts.index[-1]]
+    )
+
+
+def __read_rows(file: str):
+    with open(file) as f:
+        header, *rows = [line.rstrip("\n").split(",") for line in f]
+    return header, rows
+
+
+def __write_rows(file: str, rows: list, mode: str = "w"):
+    """Writes (or with mode "a" appends) the rows, the file's modification time is
+    moved forward so that the new version gets a new fingerprint even within the file
+    system's time resolution"""
+    mtime_ns = os.stat(file).st_mtime_ns
+    with open(file, mode) as f:
+        f.writelines(",".join(row) + "\n" for row in rows)
+    os.utime(file, ns=(mtime_ns + 10**9, mtime_ns + 10**9))
+
+
+if __name__ == "__main__":
+    # usage: python src/ingestcheck.py [csv-file]
+    for edit, stats in run(sys.argv[1] if len(sys.argv) > 1 else app_config.data_file):
+        print(
+            f"{edit:>24}: {stats['transformed']:,} of {stats['rows']:,} rows transformed"
+        )
+    print("incremental loads match full loads")
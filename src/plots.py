@@ -1,35 +1,119 @@
 """All app-specific plots are implemented here"""
 
+import functools
+import hashlib
+import threading
+import time
+
+import numpy as np
+import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
 import plotly.io as io
 from pandas import DataFrame
 from plotly.graph_objects import Figure
-from config import plot_config
+
+import utils
+from config import app_config, plot_config
 
 # setup app-wide plotly theme
 io.templates.default = plot_config.theme
 
 
+###
+### Figure cache, shared by all sessions
+###
+def __cached_figure(plot):
+    """Memoizes the figure JSON of a plot function, keyed on the function, the data
+    signature (see __data_signature) and the other arguments. A cached spec is
+    replayed into a figure instead of building it again with plotly express."""
+
+    @functools.wraps(plot)
+    def cached_plot(df: DataFrame, *args) -> Figure:
+        key = (plot.__name__, __data_signature(df), args)
+        spec = __FIGURE_CACHE.get(key)
+        if spec is None:
+            start = time.perf_counter()
+            spec = plot(df, *args).to_json()
+            __record_build_time(plot.__name__, time.perf_counter() - start)
+            __FIGURE_CACHE.put(key, spec)
+        return io.from_json(spec)
+
+    return cached_plot
+
+
+def __data_signature(df: DataFrame):
+    """Rows loaded and filtered by data.py/filters.py are identified by the dataset
+    version and the canonical filters, small aggregated frames by their content"""
+    if "version" in df.attrs:
+        return df.attrs["version"], df.attrs.get("filters", ()), len(df)
+    content = pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes()
+    return tuple(df.columns), hashlib.sha1(content).hexdigest()
+
+
+# module level (once per process), not st.cache_resource: figures are also built by
+# the warm-up thread, which has no script run context
+__FIGURE_CACHE = utils.LRUCache(max_bytes=app_config.figure_cache_bytes, sizeof=len)
+__BUILD_TIMES = {}
+__BUILD_TIMES_LOCK = threading.Lock()
+
+
+def __record_build_time(name: str, seconds: float):
+    with __BUILD_TIMES_LOCK:
+        stats = __BUILD_TIMES.setdefault(name, {"builds": 0, "total_ms": 0.0})
+        stats["builds"] += 1
+        stats["total_ms"] += seconds * 1000
+        stats["last_ms"] = round(seconds * 1000, 2)
+
+
+def get_cache_stats():
+    """Hit/miss counters of the figure cache and build times of each plot function"""
+    with __BUILD_TIMES_LOCK:
+        builds = {
+            name: dict(stats, total_ms=round(stats["total_ms"], 2))
+            for name, stats in __BUILD_TIMES.items()
+        }
+    return {"cache": __FIGURE_CACHE.stats(), "builds": builds}
+
+
 ###
 ### Summary tab plots
 ###
+@__cached_figure
 def plot_age_hist(df: DataFrame) -> Figure:
-    fig = px.histogram(
-        data_frame=df,
-        x="Age",
-        marginal="violin",
-        title="Employee's age distribution overall",
-        color_discrete_sequence=plot_config.cat_color_map,
+    # histogram with a box marginal, both computed server-side
+    color = plot_config.cat_color_map[0]
+    values = df["Age"].to_numpy()
+    stats, outliers = __box_stats(values, np.zeros(len(values), dtype="int8"), 1)
+    # the single box of the marginal, none if there's no data
+    names = [" "] if len(values) else []
+    fig = go.Figure(
+        [__histogram_trace(values, "Age", color)]
+        + __box_traces(stats, outliers, names, "Age", [color], horizontal=True),
+        layout=dict(
+            title_text="Employee's age distribution overall",
+            bargap=0,
+            showlegend=False,
+            xaxis=dict(anchor="y", domain=[0.0, 1.0], title_text="Age"),
+            yaxis=dict(anchor="x", domain=[0.0, 0.8316], title_text="count"),
+            xaxis2=dict(
+                anchor="y2", domain=[0.0, 1.0], matches="x", showticklabels=False
+            ),
+            yaxis2=dict(
+                anchor="x2",
+                domain=[0.8416, 1.0],
+                showgrid=False,
+                showline=False,
+                showticklabels=False,
+                ticks="",
+            ),
+        ),
     )
     return fig
 
 
-def plot_age_marital_status_pie(df: DataFrame) -> Figure:
-    df_group = (
-        df.groupby("MaritalStatus", as_index=False)
-        .size()
-        .sort_values(by="size", ascending=True)
-    )
+@__cached_figure
+def plot_age_marital_status_pie(df_group: DataFrame) -> Figure:
     fig = px.pie(
         data_frame=df_group,
         names="MaritalStatus",
@@ -42,36 +126,33 @@ def plot_age_marital_status_pie(df: DataFrame) -> Figure:
     return fig
 
 
+@__cached_figure
 def plot_age_marital_status_box(df: DataFrame) -> Figure:
-    fig = px.box(
-        data_frame=df,
+    fig = __box_plot(
+        df,
         x="MaritalStatus",
         y="Age",
-        color="MaritalStatus",
         title="Employee's age distribution by marital-status",
-        color_discrete_sequence=plot_config.cat_color_map,
+        colors=plot_config.cat_color_map,
     )
     return fig
 
 
+@__cached_figure
 def plot_age_gender_box(df: DataFrame) -> Figure:
-    fig = px.box(
-        data_frame=df,
+    fig = __box_plot(
+        df,
         x="Gender",
         y="Age",
-        color="Gender",
         title="Employee's age distribution by gender",
-        color_discrete_sequence=plot_config.cat_color_map,
+        colors=plot_config.cat_color_map,
     )
     return fig
 
 
-def plot_dept_gender_count_sunburst(df: DataFrame) -> Figure:
-    df_group = (
-        df.groupby(["Department", "Gender"], as_index=False)
-        .size()
-        .assign(Top="Company")
-    )
+@__cached_figure
+def plot_dept_gender_count_sunburst(df_group: DataFrame) -> Figure:
+    df_group = df_group.assign(Top="Company")
     fig = px.sunburst(
         data_frame=df_group,
         path=["Top", "Department", "Gender"],
@@ -93,14 +174,8 @@ def plot_dept_gender_count_sunburst(df: DataFrame) -> Figure:
     return fig
 
 
-def plot_dept_curr_mgr_scatter(df: DataFrame) -> Figure:
-    df_group = (
-        df.groupby("Department")["YearsWithCurrManager"]
-        .mean()
-        .to_frame()
-        .reset_index()
-        .sort_values(by="YearsWithCurrManager", ascending=False)
-    )
+@__cached_figure
+def plot_dept_curr_mgr_scatter(df_group: DataFrame) -> Figure:
     fig = px.scatter(
         data_frame=df_group,
         x="YearsWithCurrManager",
@@ -112,10 +187,8 @@ def plot_dept_curr_mgr_scatter(df: DataFrame) -> Figure:
     return fig
 
 
-def plot_tot_work_exp_bar(df):
-    tot_emp = len(df)
-    df_group = df.groupby("WorkExperience", as_index=False).size()
-    df_group["size"] = df_group["size"] / tot_emp * 100
+@__cached_figure
+def plot_tot_work_exp_bar(df_group):
     fig = px.bar(
         data_frame=df_group.sort_values(by="size", ascending=False),
         x="size",
@@ -131,16 +204,22 @@ def plot_tot_work_exp_bar(df):
     return fig
 
 
+@__cached_figure
 def plot_cmp_work_exp_scatter(df, annot_text):
-    fig = px.scatter(
-        data_frame=df,
-        x="TotalWorkingYears",
-        y="YearsAtCompany",
-        size="PctAtCompany",
-        color="PctAtCompany",
-        opacity=0.6,
-        color_continuous_scale=plot_config.cont_color_map,
-    )
+    # one marker per employee up to scatter_binned_rows, a heatmap of bins beyond
+    if len(df) > app_config.scatter_binned_rows:
+        fig = __binned_scatter(df, x="TotalWorkingYears", y="YearsAtCompany")
+    else:
+        fig = px.scatter(
+            data_frame=df,
+            x="TotalWorkingYears",
+            y="YearsAtCompany",
+            size="PctAtCompany",
+            color="PctAtCompany",
+            opacity=0.6,
+            color_continuous_scale=plot_config.cont_color_map,
+            render_mode=__scatter_render_mode(df),
+        )
     fig.add_annotation(
         x=0.1,
         y=35,
@@ -163,14 +242,9 @@ def plot_cmp_work_exp_scatter(df, annot_text):
 ###
 ### Capacity tab plots - Promotion and Retrenchment
 ###
-def plot_promotion_donut(df):
-    df_group = (
-        df["ToBePromoted"]
-        .value_counts()
-        .to_frame()
-        .reset_index()
-        .rename({"ToBePromoted": "Promotion", "count": "Count"}, axis=1)
-    )
+@__cached_figure
+def plot_promotion_donut(df_group):
+    df_group = df_group.rename({"ToBePromoted": "Promotion", "count": "Count"}, axis=1)
     fig = px.pie(
         df_group,
         names="Promotion",
@@ -187,14 +261,9 @@ def plot_promotion_donut(df):
     return fig
 
 
-def plot_retrench_donut(df):
-    df_group = (
-        df["ToBeRetrenched"]
-        .value_counts()
-        .to_frame()
-        .reset_index()
-        .rename({"ToBeRetrenched": "Retrench", "count": "Count"}, axis=1)
-    )
+@__cached_figure
+def plot_retrench_donut(df_group):
+    df_group = df_group.rename({"ToBeRetrenched": "Retrench", "count": "Count"}, axis=1)
 
     fig = px.pie(
         df_group,
@@ -212,6 +281,7 @@ def plot_retrench_donut(df):
     return fig
 
 
+@__cached_figure
 def plot_dept_promo_bar(df):
     fig = px.bar(
         data_frame=df,
@@ -230,6 +300,7 @@ def plot_dept_promo_bar(df):
     return fig
 
 
+@__cached_figure
 def plot_dept_retrench_bar(df):
     df_group = df
     fig = px.bar(
@@ -252,6 +323,7 @@ def plot_dept_retrench_bar(df):
 ###
 ### Capacity tab plots - Attrition
 ###
+@__cached_figure
 def plot_dept_attrition(df):
     fig = px.pie(
         data_frame=df,
@@ -271,6 +343,7 @@ def plot_dept_attrition(df):
     return fig
 
 
+@__cached_figure
 def plot_gender_attrition(df):
     fig = px.pie(
         data_frame=df,
@@ -286,6 +359,7 @@ def plot_gender_attrition(df):
     return fig
 
 
+@__cached_figure
 def plot_dist_attrition(df):
     fig = px.bar(
         data_frame=df,
@@ -304,6 +378,7 @@ def plot_dist_attrition(df):
     return fig
 
 
+@__cached_figure
 def plot_jobrole_attrition(df):
     fig = px.bar(
         data_frame=df,
@@ -322,6 +397,7 @@ def plot_jobrole_attrition(df):
     return fig
 
 
+@__cached_figure
 def plot_satis_attrition(df):
     fig = px.bar(
         data_frame=df,
@@ -340,6 +416,7 @@ def plot_satis_attrition(df):
     return fig
 
 
+@__cached_figure
 def plot_ages_attrition(df):
     fig = px.bar(
         data_frame=df,
@@ -358,6 +435,7 @@ def plot_ages_attrition(df):
     return fig
 
 
+@__cached_figure
 def plot_exp_attrition(df):
     fig = px.bar(
         data_frame=df,
@@ -374,3 +452,183 @@ def plot_exp_attrition(df):
         showlegend=False,
     )
     return fig
+
+
+###
+### module's internal functions
+###
+# upper limit of the number of histogram bins
+__HISTOGRAM_BINS = 50
+
+
+def __scatter_render_mode(df: DataFrame) -> str:
+    """WebGL markers above scatter_webgl_rows, SVG markers otherwise"""
+    return "webgl" if len(df) > app_config.scatter_webgl_rows else "svg"
+
+
+def __binned_scatter(df: DataFrame, x: str, y: str, z: str = "PctAtCompany"):
+    """Heatmap of the mean z of the employees in each integer (x, y) bin, computed
+    server-side, so the payload depends on the x/y ranges instead of the headcount"""
+    xs = df[x].to_numpy().astype("int64")
+    ys = df[y].to_numpy().astype("int64")
+    x0, y0 = xs.min(), ys.min()
+    shape = (ys.max() - y0 + 1, xs.max() - x0 + 1)
+    keys = np.ravel_multi_index((ys - y0, xs - x0), shape)
+    size = shape[0] * shape[1]
+    counts = np.bincount(keys, minlength=size).reshape(shape)
+    sums = np.bincount(keys, weights=df[z].to_numpy(), minlength=size).reshape(shape)
+    # empty bins are NaN, left blank by the heatmap
+    with np.errstate(invalid="ignore"):
+        means = sums / counts
+    fig = go.Figure(
+        go.Heatmap(
+            x=np.arange(x0, x0 + shape[1]),
+            y=np.arange(y0, y0 + shape[0]),
+            z=means.round(2),
+            customdata=counts,
+            colorscale=plot_config.cont_color_map,
+            colorbar_title_text=z,
+            hovertemplate=f"{x}=%{{x}}<br>{y}=%{{y}}<br>{z} (mean)=%{{z:.1f}}"
+            + "<br>employees=%{customdata}<extra></extra>",
+        )
+    )
+    fig.update_layout(xaxis_title_text=x, yaxis_title_text=y)
+    return fig
+
+
+def __box_plot(df: DataFrame, x: str, y: str, title: str, colors) -> Figure:
+    """Box plot of y for each category of x, like px.box(x=x, y=y, color=x) but the
+    box statistics are computed server-side and only they are sent to the browser"""
+    categories = df[x].cat.categories
+    stats, outliers = __box_stats(
+        df[y].to_numpy(), df[x].cat.codes.to_numpy(), len(categories)
+    )
+    # empty categories get no box, as with px.box
+    present = np.flatnonzero(stats["count"])
+    stats = {stat: values[present] for stat, values in stats.items()}
+    names = list(categories[present])
+    remap = np.full(len(categories), -1)
+    remap[present] = np.arange(len(present))
+    outliers = (outliers[0], remap[outliers[1]])
+    colors = [colors[i % len(colors)] for i in range(len(names))]
+    return go.Figure(
+        __box_traces(stats, outliers, names, y, colors),
+        layout=dict(
+            title_text=title,
+            boxmode="overlay",
+            legend=dict(title_text=x, tracegroupgap=0),
+            xaxis=dict(title_text=x, categoryorder="array", categoryarray=names),
+            yaxis=dict(title_text=y),
+        ),
+    )
+
+
+def __box_stats(values: np.ndarray, groups: np.ndarray, n_groups: int):
+    """Vectorized box statistics of the values in each group (codes 0..n_groups-1,
+    -1 is ignored): count, linear interpolated quartiles and the whiskers, i.e. the
+    most extreme values within 1.5 IQR of the box. Outliers are returned as a pair
+    of arrays, the values and their groups."""
+    valid = (groups >= 0) & ~np.isnan(values.astype("float64"))
+    values, groups = values[valid].astype("float64"), groups[valid]
+    # sorted by group, then by value
+    order = np.lexsort((values, groups))
+    values, groups = values[order], groups[order]
+    count = np.bincount(groups, minlength=n_groups)
+    start = np.cumsum(count) - count
+    last = np.maximum(count - 1, 0)
+
+    def quantile(q):
+        pos = start + q * last
+        low = np.floor(pos).astype("int64")
+        high = np.ceil(pos).astype("int64")
+        if not len(values):
+            return np.full(n_groups, np.nan)
+        low, high = np.minimum(low, len(values) - 1), np.minimum(high, len(values) - 1)
+        return values[low] + (values[high] - values[low]) * (pos - low)
+
+    q1, median, q3 = quantile(0.25), quantile(0.5), quantile(0.75)
+    iqr = q3 - q1
+    inside = (values >= (q1 - 1.5 * iqr)[groups]) & (values <= (q3 + 1.5 * iqr)[groups])
+    lowerfence = np.full(n_groups, np.inf)
+    upperfence = np.full(n_groups, -np.inf)
+    np.minimum.at(lowerfence, groups[inside], values[inside])
+    np.maximum.at(upperfence, groups[inside], values[inside])
+    stats = dict(
+        count=count,
+        q1=q1,
+        median=median,
+        q3=q3,
+        lowerfence=lowerfence,
+        upperfence=upperfence,
+    )
+    return stats, (values[~inside], groups[~inside])
+
+
+def __box_traces(stats, outliers, names, label, colors, horizontal=False):
+    """Precomputed box per group, plus its outliers as markers"""
+    traces = []
+    for i, (name, color) in enumerate(zip(names, colors)):
+        position = dict(y=[name]) if horizontal else dict(x=[name])
+        traces.append(
+            go.Box(
+                name=name,
+                q1=stats["q1"][i : i + 1],
+                median=stats["median"][i : i + 1],
+                q3=stats["q3"][i : i + 1],
+                lowerfence=stats["lowerfence"][i : i + 1],
+                upperfence=stats["upperfence"][i : i + 1],
+                orientation="h" if horizontal else "v",
+                marker_color=color,
+                legendgroup=name,
+                offsetgroup=name,
+                alignmentgroup="True",
+                xaxis="x2" if horizontal else "x",
+                yaxis="y2" if horizontal else "y",
+                **position,
+            )
+        )
+        values = outliers[0][outliers[1] == i]
+        if len(values):
+            points = dict(x=values, y=[name] * len(values))
+            if not horizontal:
+                points = dict(x=points["y"], y=points["x"])
+            traces.append(
+                go.Scatter(
+                    mode="markers",
+                    marker_color=color,
+                    legendgroup=name,
+                    showlegend=False,
+                    hovertemplate=f"{label}=%{{{'x' if horizontal else 'y'}}}"
+                    + "<extra>outlier</extra>",
+                    xaxis="x2" if horizontal else "x",
+                    yaxis="y2" if horizontal else "y",
+                    **points,
+                )
+            )
+    return traces
+
+
+def __histogram_trace(values: np.ndarray, label: str, color: str):
+    """Histogram bars with counts computed server-side, integer width bins (at most
+    __HISTOGRAM_BINS of them) so integer valued data isn't split between bins"""
+    values = values[~np.isnan(values.astype("float64"))]
+    if not len(values):
+        return go.Bar(x=[], y=[], marker_color=color, name="")
+    low = np.floor(values.min())
+    width = max(1, int(np.ceil((values.max() - low + 1) / __HISTOGRAM_BINS)))
+    counts = np.bincount(((values - low) // width).astype("int64"))
+    edges = low + width * np.arange(len(counts) + 1)
+    label_text = (
+        edges[:-1]
+        if width == 1
+        else [f"{a:g}-{b - 1:g}" for a, b in zip(edges[:-1], edges[1:])]
+    )
+    return go.Bar(
+        x=edges[:-1] + (width - 1) / 2,
+        y=counts,
+        width=width,
+        customdata=label_text,
+        marker_color=color,
+        name="",
+        hovertemplate=f"{label}=%{{customdata}}<br>count=%{{y}}<extra></extra>",
+    )
@@ -0,0 +1,102 @@
+"""HR policy rules deriving the Yes/No employee flags, declared once and compiled to
+vectorized numpy expressions"""
+
+import ast
+import sys
+import time
+
+import numpy as np
+from pandas import CategoricalDtype, DataFrame
+
+### define all policy rules here, each rule is a boolean expression over the data
+### columns and flags of the rules declared before it. Categorical columns can only be
+### compared for (in)equality with a literal, i.e. Attrition == 'No'
+POLICY_RULES = {
+    ## ToBePromoted
+    # if yrs since last promotion >= 10 yrs and performance rating is > 2
+    "ToBePromoted": "(YearsSinceLastPromotion >= 10) & (PerformanceRating > 2)",
+    ## ToBeRetrenched
+    # 1) If years in current-role is >= 10 years and performance-rating < 3
+    # 2) If years in current-role is between 3 to 10 years and performance-rating == 1
+    #    and still with the company and not-to-be-promoted
+    "ToBeRetrenched": "((YearsInCurrentRole >= 10) & (PerformanceRating < 3))"
+    + " | ((YearsInCurrentRole > 2) & (YearsInCurrentRole < 10)"
+    + " & (PerformanceRating == 1) & (Attrition == 'No') & ~ToBePromoted)",
+}
+
+
+def evaluate(df: DataFrame, rules: dict = POLICY_RULES) -> dict:
+    """Evaluate the rules against the data frame, returns a boolean numpy array per
+    rule. Columns are read as numpy arrays (categorical columns as their codes), no
+    index is built and the frame is not modified."""
+    namespace = {}
+    flags = {}
+    for name, expr in rules.items():
+        tree = ast.parse(expr, mode="eval")
+        for col in {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}:
+            if col not in namespace and col not in flags:
+                namespace[col] = __column_values(df, col)
+        tree = ast.fix_missing_locations(__CategoryLiterals(df).visit(tree))
+        code = compile(tree, filename=f"<rule {name}>", mode="eval")
+        flags[name] = namespace[name] = eval(code, {"__builtins__": {}}, namespace)
+    return flags
+
+
+def benchmark(df: DataFrame, repeat: int = 10) -> float:
+    """Best wall time in seconds out of repeat evaluations of all policy rules"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        evaluate(df)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+### module's internal functions
+def __column_values(df: DataFrame, col: str) -> np.ndarray:
+    if col not in df.columns:
+        raise KeyError(f"Policy rule refers to unknown column or flag '{col}'")
+    if isinstance(df[col].dtype, CategoricalDtype):
+        return df[col].cat.codes.to_numpy()
+    return df[col].to_numpy()
+
+
+class __CategoryLiterals(ast.NodeTransformer):
+    """Rewrites `<categorical column> == 'literal'` into a comparison of the column
+    codes with the literal's code, so no string comparison happens per row"""
+
+    def __init__(self, df: DataFrame):
+        self.df = df
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        if len(node.ops) != 1:
+            return node
+        left, right = node.left, node.comparators[0]
+        if isinstance(left, ast.Constant) and isinstance(right, ast.Name):
+            left, right = right, left
+        if not (isinstance(left, ast.Name) and isinstance(right, ast.Constant)):
+            return node
+        if left.id not in self.df.columns:
+            return node
+        dtype = self.df[left.id].dtype
+        if not isinstance(dtype, CategoricalDtype):
+            return node
+        if not isinstance(node.ops[0], (ast.Eq, ast.NotEq)):
+            raise ValueError(f"Categorical column '{left.id}' supports only == and !=")
+        categories = list(dtype.categories)
+        # -2 never matches, -1 is already taken by missing values
+        code = categories.index(right.value) if right.value in categories else -2
+        return ast.Compare(left=left, ops=node.ops, comparators=[ast.Constant(code)])
+
+
+if __name__ == "__main__":
+    # usage: python src/rules.py [csv-file] [rows]
+    import data
+    from config import app_config
+
+    file = sys.argv[1] if len(sys.argv) > 1 else app_config.data_file
+    df = data.load_transform(file)
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else len(df)
+    df = df.sample(n=rows, replace=rows > len(df), random_state=0)
+    print(f"{len(df):,} rows: {benchmark(df) * 1000:.3f} ms per evaluation")
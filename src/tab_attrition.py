@@ -5,20 +5,27 @@ import streamlit
 import utils
 import data
 import plots
+from aggregates import Aggregates
 
 
 ###
 ### render the capacity page
 ###
-def render(df: pd.DataFrame):
+def render(df: pd.DataFrame, kpis: Aggregates):
     # Show KPI & plots
-    __build_attrition_plots(df)
+    __build_attrition_plots(kpis)
+
+
+def figure_tasks(df: pd.DataFrame, kpis: Aggregates) -> dict:
+    """Builds of all figures of the tab (name -> function without arguments), as run
+    by the warm-up"""
+    return __attrition_figure_tasks(data.get_attrition_stats(kpis))
 
 
 ###
 ### module's internal functions
 ###
-def __build_attrition_plots(df):
+def __build_attrition_plots(kpis):
     with streamlit.expander("Analysis: Employee Attrition...", expanded=True):
         utils.show_questions(
             [
@@ -28,7 +35,12 @@ def __build_attrition_plots(df):
         )
         utils.sep()
         ### gather attrition statistics
-        attrition_stats = data.get_attrition_stats(df)
+        attrition_stats = data.get_attrition_stats(kpis)
+        ### build the figures, they are rendered in layout order below
+        figs = {
+            name: build()
+            for name, build in __attrition_figure_tasks(attrition_stats).items()
+        }
 
         ### overall, male and female attrition rates
         with streamlit.container():
@@ -88,15 +100,9 @@ def __build_attrition_plots(df):
                 c2_col2,
             ) = streamlit.columns(2)
             with c2_col1:
-                streamlit.plotly_chart(
-                    plots.plot_dept_attrition(attrition_stats["Department"]),
-                    use_container_width=True,
-                )
+                utils.plotly_chart(figs["dept_attrition"], use_container_width=True)
             with c2_col2:
-                streamlit.plotly_chart(
-                    plots.plot_jobrole_attrition(attrition_stats["JobRole"]),
-                    use_container_width=True,
-                )
+                utils.plotly_chart(figs["jobrole_attrition"], use_container_width=True)
         utils.sep()
 
         ### attrition by distance to work & job satisfaction
@@ -106,15 +112,9 @@ def __build_attrition_plots(df):
                 c3_col2,
             ) = streamlit.columns(2)
             with c3_col1:
-                streamlit.plotly_chart(
-                    plots.plot_dist_attrition(attrition_stats["WorkplaceProximity"]),
-                    use_container_width=True,
-                )
+                utils.plotly_chart(figs["dist_attrition"], use_container_width=True)
             with c3_col2:
-                streamlit.plotly_chart(
-                    plots.plot_satis_attrition(attrition_stats["JobSatisfaction"]),
-                    use_container_width=True,
-                )
+                utils.plotly_chart(figs["satis_attrition"], use_container_width=True)
         utils.sep()
 
         ### attrition by age & work-experience
@@ -124,16 +124,10 @@ def __build_attrition_plots(df):
                 c4_col2,
             ) = streamlit.columns(2)
             with c4_col1:
-                streamlit.plotly_chart(
-                    plots.plot_ages_attrition(attrition_stats["Ages"]),
-                    use_container_width=True,
-                )
+                utils.plotly_chart(figs["ages_attrition"], use_container_width=True)
             with c4_col2:
                 # attrition by work exp buckets - horizontal bar
-                streamlit.plotly_chart(
-                    plots.plot_exp_attrition(attrition_stats["WorkExperience"]),
-                    use_container_width=True,
-                )
+                utils.plotly_chart(figs["exp_attrition"], use_container_width=True)
         utils.sep()
 
         with streamlit.expander("View Insights...", expanded=True):
@@ -160,3 +154,24 @@ def __build_attrition_plots(df):
                     "why this particular age group does not prefer to stay longer?",
                 ]
             )
+
+
+def __attrition_figure_tasks(attrition_stats: dict) -> dict:
+    return {
+        "dept_attrition": lambda: plots.plot_dept_attrition(
+            attrition_stats["Department"]
+        ),
+        "jobrole_attrition": lambda: plots.plot_jobrole_attrition(
+            attrition_stats["JobRole"]
+        ),
+        "dist_attrition": lambda: plots.plot_dist_attrition(
+            attrition_stats["WorkplaceProximity"]
+        ),
+        "satis_attrition": lambda: plots.plot_satis_attrition(
+            attrition_stats["JobSatisfaction"]
+        ),
+        "ages_attrition": lambda: plots.plot_ages_attrition(attrition_stats["Ages"]),
+        "exp_attrition": lambda: plots.plot_exp_attrition(
+            attrition_stats["WorkExperience"]
+        ),
+    }
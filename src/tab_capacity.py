@@ -5,22 +5,37 @@ import streamlit
 import utils
 import data
 import plots
+from aggregates import Aggregates
 
 
 ###
 ### render the capacity page
 ###
-def render(df: pd.DataFrame):
+def render(df: pd.DataFrame, kpis: Aggregates):
     # Show KPI cards section
-    __build_kpi_cards(df)
+    __build_kpi_cards(kpis)
     # Show plots
-    __build_dept_promo_retrench_plots(df)
+    __build_dept_promo_retrench_plots(kpis)
+
+
+def figure_tasks(df: pd.DataFrame, kpis: Aggregates) -> dict:
+    """Builds of all figures of the tab (name -> function without arguments), as run
+    by the warm-up"""
+    return {
+        "promotion_donut": lambda: plots.plot_promotion_donut(
+            data.get_flag_count(kpis, "ToBePromoted")
+        ),
+        "retrench_donut": lambda: plots.plot_retrench_donut(
+            data.get_flag_count(kpis, "ToBeRetrenched")
+        ),
+        **__dept_promo_retrench_figure_tasks(kpis),
+    }
 
 
 ###
 ### module's internal functions
 ###
-def __build_kpi_cards(df):
+def __build_kpi_cards(kpis):
     with streamlit.expander("Overall promotion & retrenchment stats...", expanded=True):
         ### List questions/objectives
         utils.show_questions(
@@ -33,10 +48,10 @@ def __build_kpi_cards(df):
 
         ### Overall promotion stats
         with promo_col:
-            __show_promotion_stats(df)
+            __show_promotion_stats(kpis)
         ### Overall retrenchment stats
         with retrench_col:
-            __show_retrench_stats(df)
+            __show_retrench_stats(kpis)
 
         ## List insights drawn wrt to objectives/questions
         with streamlit.expander("View insights...", expanded=True):
@@ -52,8 +67,8 @@ def __build_kpi_cards(df):
             )
 
 
-def __show_promotion_stats(df):
-    promo_cnt, not_promo_cnt, promo_pct, no_promo_pct = data.get_promo_count(df)
+def __show_promotion_stats(kpis):
+    promo_cnt, not_promo_cnt, promo_pct, no_promo_pct = data.get_promo_count(kpis)
     utils.render_card(
         key="promo_card",
         title="Promote",
@@ -72,17 +87,17 @@ def __show_promotion_stats(df):
         progress_value=int(no_promo_pct),
         progress_color="red",
     )
-    fig = plots.plot_promotion_donut(df)
-    streamlit.plotly_chart(fig, use_container_width=True)
+    fig = plots.plot_promotion_donut(data.get_flag_count(kpis, "ToBePromoted"))
+    utils.plotly_chart(fig, use_container_width=True)
 
 
-def __show_retrench_stats(df):
+def __show_retrench_stats(kpis):
     (
         retrench_cnt,
         not_retrench_cnt,
         retrench_pct,
         not_retrench_pct,
-    ) = data.get_retrench_count(df)
+    ) = data.get_retrench_count(kpis)
     utils.render_card(
         key="no_retrench_card",
         title="No Retrench",
@@ -101,11 +116,11 @@ def __show_retrench_stats(df):
         progress_value=int(retrench_pct),
         progress_color="red",
     )
-    fig = plots.plot_retrench_donut(df)
-    streamlit.plotly_chart(fig, use_container_width=True)
+    fig = plots.plot_retrench_donut(data.get_flag_count(kpis, "ToBeRetrenched"))
+    utils.plotly_chart(fig, use_container_width=True)
 
 
-def __build_dept_promo_retrench_plots(df):
+def __build_dept_promo_retrench_plots(kpis):
     with streamlit.expander(
         "Analysis: Department wise promotion & retrenchment...", expanded=True
     ):
@@ -116,15 +131,16 @@ def __build_dept_promo_retrench_plots(df):
             ]
         )
 
+        ### build the figures, they are rendered in layout order below
+        figs = {
+            name: build()
+            for name, build in __dept_promo_retrench_figure_tasks(kpis).items()
+        }
         promo_col, retrench_col = streamlit.columns(2)
         with promo_col:
-            df_promo = data.get_dept_promo_pct(df)
-            fig = plots.plot_dept_promo_bar(df_promo)
-            streamlit.plotly_chart(fig, use_container_width=True)
+            utils.plotly_chart(figs["dept_promo_bar"], use_container_width=True)
         with retrench_col:
-            df_retrench = data.get_dept_retrench_pct(df)
-            fig = plots.plot_dept_retrench_bar(df_retrench)
-            streamlit.plotly_chart(fig, use_container_width=True)
+            utils.plotly_chart(figs["dept_retrench_bar"], use_container_width=True)
         with streamlit.expander("View Insights...", expanded=True):
             utils.show_insights(
                 [
@@ -136,3 +152,14 @@ def __build_dept_promo_retrench_plots(df):
                     + "are projecting more than twice the stipulated target (max 5%) ",
                 ]
             )
+
+
+def __dept_promo_retrench_figure_tasks(kpis: Aggregates) -> dict:
+    return {
+        "dept_promo_bar": lambda: plots.plot_dept_promo_bar(
+            data.get_dept_promo_pct(kpis)
+        ),
+        "dept_retrench_bar": lambda: plots.plot_dept_retrench_bar(
+            data.get_dept_retrench_pct(kpis)
+        ),
+    }
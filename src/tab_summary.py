@@ -1,51 +1,122 @@
 """Summary tab rendering functionality"""
 
 import pandas as pd
-import matplotlib.pyplot as plt
 import streamlit
 import streamlit_nested_layout  # unofficial package for nested layout
 
 import data
+import downloads
+import grid
 import plots
 import utils
+from aggregates import Aggregates
 from config import app_config
 
 
 ###
 ### render the summary page
 ###
-def render(df: pd.DataFrame):
+def render(df: pd.DataFrame, kpis: Aggregates):
     # Show sample data in a dataframe
     __show_sample_data(df)
     # Show KPI cards section
-    __build_kpi_cards(df)
+    __build_kpi_cards(kpis)
     # Show plots
-    __build_age_plots(df)
-    __build_dept_plots(df)
-    __build_exp_plots(df)
+    __build_age_plots(df, kpis)
+    __build_dept_plots(kpis)
+    __build_exp_plots(df, kpis)
+
+
+def figure_tasks(df: pd.DataFrame, kpis: Aggregates) -> dict:
+    """Builds of all figures and tables of the tab (name -> function without
+    arguments), as run by the warm-up"""
+    return {
+        **__age_figure_tasks(df, kpis),
+        **__dept_figure_tasks(kpis),
+        **__exp_figure_tasks(df, kpis),
+    }
 
 
 ###
 ### module's internal functions
 ###
 def __show_sample_data(df: pd.DataFrame):
-    """Display sample data as pandas DataFrame"""
+    """Display the (filtered) data in a paginated grid and download it"""
     with streamlit.expander("View sample data | Download dataset..."):
-        streamlit.markdown("#### Top 5 rows")
-        streamlit.dataframe(df.head(5))
-        streamlit.markdown("#### Bottom 5 rows")
-        streamlit.dataframe(df.tail(5))
-        # read the file again and then download
-        csv = data.df_to_csv(app_config.data_file)
-        utils.download_file(
-            btn_label="Download As CSV",
-            data=csv,
-            file_name="hr_data_downloaded.csv",
-            mime_type="text/csv",
+        __show_data_grid(df)
+        utils.sep()
+        __show_download(df)
+
+
+@streamlit.fragment
+def __show_data_grid(df: pd.DataFrame):
+    """Grid of the rows sorted and paged server-side, only the page is sent"""
+    sort_col, order_col, size_col, page_col = streamlit.columns(4)
+    with sort_col:
+        sort_by = streamlit.selectbox("Sort by", list(df.columns), key="grid_sort_by")
+    with order_col:
+        order = streamlit.radio(
+            "Order", ["Ascending", "Descending"], horizontal=True, key="grid_order"
+        )
+    with size_col:
+        page_size = streamlit.selectbox(
+            "Rows per page", [10, 25, 50, 100], key="grid_page_size"
         )
+    pages = max(1, -(-len(df) // page_size))
+    # filters may have left fewer pages than the selected one
+    if streamlit.session_state.get("grid_page", 1) > pages:
+        streamlit.session_state["grid_page"] = pages
+    with page_col:
+        page = streamlit.number_input(
+            "Page", min_value=1, max_value=pages, step=1, key="grid_page"
+        )
+    first_row = (page - 1) * page_size
+    streamlit.dataframe(
+        grid.get_page(df, sort_by, order == "Ascending", page - 1, page_size),
+        use_container_width=True,
+    )
+    streamlit.caption(
+        f"Rows {min(first_row + 1, len(df)):,}-{min(first_row + page_size, len(df)):,}"
+        + f" of {len(df):,}, page {page:,} of {pages:,}"
+    )
+
 
+@streamlit.fragment
+def __show_download(df: pd.DataFrame):
+    """Download of the raw file or the filtered rows, the export is only built when
+    requested and reused until the data (or, for the filtered rows, the filters)
+    change"""
+    rows_col, format_col = streamlit.columns(2)
+    with rows_col:
+        rows = streamlit.radio(
+            "Rows",
+            ["All employees (raw file)", "Filtered employees"],
+            horizontal=True,
+            key="download_rows",
+        )
+    with format_col:
+        fmt = streamlit.selectbox(
+            "Format", list(downloads.FORMATS), key="download_format"
+        )
+    if streamlit.button("Prepare download"):
+        with streamlit.spinner("Preparing download..."):
+            if rows == "Filtered employees":
+                path = downloads.export_rows(df, fmt)
+            else:
+                path = downloads.export_raw(app_config.data_file, fmt)
+        # the export is read and handed to streamlit in this run only, not again on
+        # every later rerun. Preparing it again reuses the export file on disk.
+        extension, mime_type = downloads.FORMATS[fmt]
+        with open(path, "rb") as f:
+            utils.download_file(
+                btn_label=f"Download As {fmt}",
+                data=f,
+                file_name=f"hr_data_downloaded{extension}",
+                mime_type=mime_type,
+            )
 
-def __build_kpi_cards(df: pd.DataFrame):
+
+def __build_kpi_cards(kpis: Aggregates):
     """display total, male, female employees cards"""
     with streamlit.expander("View Gender Stats...", expanded=True):
         ## List questions/objectives
@@ -56,7 +127,7 @@ def __build_kpi_cards(df: pd.DataFrame):
         )
 
         # total and gender wise emp count
-        __show_emp_count_card(df)
+        __show_emp_count_card(kpis)
 
         ## List insights drawn wrt to objectives/questions
         with streamlit.expander("View insights..."):
@@ -68,14 +139,14 @@ def __build_kpi_cards(df: pd.DataFrame):
             )
 
 
-def __show_emp_count_card(df):
+def __show_emp_count_card(kpis):
     (
         tot_emp_cnt,
         male_emp_cnt,
         female_emp_cnt,
         male_pct,
         female_pct,
-    ) = data.get_gender_count(df)
+    ) = data.get_gender_count(kpis)
 
     with streamlit.container():
         g_col1, g_col2, g_col3 = streamlit.columns(3)
@@ -108,7 +179,7 @@ def __show_emp_count_card(df):
             )
 
 
-def __build_age_plots(df: pd.DataFrame):
+def __build_age_plots(df: pd.DataFrame, kpis: Aggregates):
     ### age distribution
     with streamlit.expander("Analysis: Age & Marital Status...", expanded=True):
         utils.show_questions(
@@ -120,22 +191,20 @@ def __build_age_plots(df: pd.DataFrame):
             ]
         )
 
+        ### build the figures, they are rendered in layout order below
+        figs = {name: build() for name, build in __age_figure_tasks(df, kpis).items()}
         (
             age_dist_col1,
             age_dist_col2,
         ) = streamlit.columns(2)
         with age_dist_col1:
-            fig_age_hist = plots.plot_age_hist(df)
-            streamlit.plotly_chart(fig_age_hist, use_container_width=True)
+            utils.plotly_chart(figs["age_hist"], use_container_width=True)
         with age_dist_col2:
-            fig_age_box = plots.plot_age_gender_box(df)
-            streamlit.plotly_chart(fig_age_box, use_container_width=True)
+            utils.plotly_chart(figs["age_gender_box"], use_container_width=True)
         with age_dist_col1:
-            fig_age_box = plots.plot_age_marital_status_pie(df)
-            streamlit.plotly_chart(fig_age_box, use_container_width=True)
+            utils.plotly_chart(figs["age_marital_status_pie"], use_container_width=True)
         with age_dist_col2:
-            fig_age_box = plots.plot_age_marital_status_box(df)
-            streamlit.plotly_chart(fig_age_box, use_container_width=True)
+            utils.plotly_chart(figs["age_marital_status_box"], use_container_width=True)
         ### List insights drawn wrt to objectives/questions
         with streamlit.expander("View insights...", expanded=True):
             utils.show_insights(
@@ -159,7 +228,18 @@ def __build_age_plots(df: pd.DataFrame):
             )
 
 
-def __build_dept_plots(df: pd.DataFrame):
+def __age_figure_tasks(df: pd.DataFrame, kpis: Aggregates) -> dict:
+    return {
+        "age_hist": lambda: plots.plot_age_hist(df),
+        "age_gender_box": lambda: plots.plot_age_gender_box(df),
+        "age_marital_status_pie": lambda: plots.plot_age_marital_status_pie(
+            data.get_marital_status_count(kpis)
+        ),
+        "age_marital_status_box": lambda: plots.plot_age_marital_status_box(df),
+    }
+
+
+def __build_dept_plots(kpis: Aggregates):
     ### department stats
     with streamlit.expander("Analysis: Departments...", expanded=True):
         utils.show_questions(
@@ -171,21 +251,24 @@ def __build_dept_plots(df: pd.DataFrame):
                 "* Which department is the best paymaster? ",
             ]
         )
-        fig_dept_gender_count = plots.plot_dept_gender_count_sunburst(df)
-        streamlit.plotly_chart(fig_dept_gender_count, use_container_width=True)
+        ### build the figures and the stats table
+        results = {name: build() for name, build in __dept_figure_tasks(kpis).items()}
+        utils.plotly_chart(results["dept_gender_sunburst"], use_container_width=True)
         with streamlit.container():
             ## department stats table
             utils.sep()
             streamlit.markdown("###### Department Stats")
-            df_dept_stats = data.get_dept_stats_df(df)
+            df_dept_stats = results["dept_stats_df"]
+            # the gradient's colormap imports matplotlib, on first render only
             streamlit.dataframe(
                 df_dept_stats.style.background_gradient(cmap="Oranges"),
                 use_container_width=True,
             )
             ## yrs with curr manager
             utils.sep()
-            fig_dept_curr_mgr = plots.plot_dept_curr_mgr_scatter(df)
-            streamlit.plotly_chart(fig_dept_curr_mgr, use_container_width=True)
+            utils.plotly_chart(
+                results["dept_curr_mgr_scatter"], use_container_width=True
+            )
         with streamlit.expander("View insights..."):
             utils.show_insights(
                 [
@@ -206,7 +289,19 @@ def __build_dept_plots(df: pd.DataFrame):
             )
 
 
-def __build_exp_plots(df: pd.DataFrame):
+def __dept_figure_tasks(kpis: Aggregates) -> dict:
+    return {
+        "dept_gender_sunburst": lambda: plots.plot_dept_gender_count_sunburst(
+            data.get_dept_gender_count(kpis)
+        ),
+        "dept_stats_df": lambda: data.get_dept_stats_df(kpis),
+        "dept_curr_mgr_scatter": lambda: plots.plot_dept_curr_mgr_scatter(
+            data.get_dept_curr_mgr_mean(kpis)
+        ),
+    }
+
+
+def __build_exp_plots(df: pd.DataFrame, kpis: Aggregates):
     ### experience stat
     with streamlit.expander("Analysis: Work experience...", expanded=True):
         utils.show_questions(
@@ -216,18 +311,15 @@ def __build_exp_plots(df: pd.DataFrame):
                 "* Do employees prefer to work with our company for most of their working life? ",
             ]
         )
+        ### build the figures, they are rendered in layout order below
+        figs = {name: build() for name, build in __exp_figure_tasks(df, kpis).items()}
         exp_stat_col1, exp_stat_col2 = streamlit.columns(2)
         with exp_stat_col1:
             # Total work experience
-            fig_plot_tot_work_exp = plots.plot_tot_work_exp_bar(df)
-            streamlit.plotly_chart(fig_plot_tot_work_exp, use_container_width=True)
+            utils.plotly_chart(figs["tot_work_exp_bar"], use_container_width=True)
         # Total experience Vs experience in our company
         with exp_stat_col2:
-            # Total work experience
-            pct_at_cmp = data.get_pct_at_cmp(df)
-            annot_text = __get_pct_at_cmp_annot_text(pct_at_cmp)
-            fig_plot_cmp_work_exp = plots.plot_cmp_work_exp_scatter(df, annot_text)
-            streamlit.plotly_chart(fig_plot_cmp_work_exp, use_container_width=True)
+            utils.plotly_chart(figs["cmp_work_exp_scatter"], use_container_width=True)
         with streamlit.expander("View insights...", expanded=True):
             utils.show_insights(
                 [
@@ -242,6 +334,16 @@ def __build_exp_plots(df: pd.DataFrame):
             )
 
 
+def __exp_figure_tasks(df: pd.DataFrame, kpis: Aggregates) -> dict:
+    annot_text = __get_pct_at_cmp_annot_text(data.get_pct_at_cmp(kpis))
+    return {
+        "tot_work_exp_bar": lambda: plots.plot_tot_work_exp_bar(
+            data.get_work_exp_pct(kpis)
+        ),
+        "cmp_work_exp_scatter": lambda: plots.plot_cmp_work_exp_scatter(df, annot_text),
+    }
+
+
 def __get_pct_at_cmp_annot_text(pct_at_cmp):
     annot_text = "Employee % by yrs work for company [in %] <br>"
     annot_text += "-----------------------------------------<br>"
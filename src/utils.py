@@ -1,10 +1,20 @@
 """App agnostic reusable utility functionality"""
 
+import base64
+import contextlib
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
 from typing import List
-from PIL import Image
 
+import numpy as np
+import plotly.utils
 import streamlit
-from streamlit_kpi import streamlit_kpi as card
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 from config import app_config
 
 
@@ -19,11 +29,24 @@ def setup_app(config):
     __set_banner_title(banner=config.banner_image, title=config.app_title)
 
 
+def load_banner(banner: str):
+    """Banner image resized to the app's banner height, once per file version"""
+    return __resized_banner(banner, os.stat(banner).st_mtime_ns)
+
+
 def create_tabs(tabs: List[str]):
     """Creates streamlit tabs"""
     return streamlit.tabs(tabs)
 
 
+def select_tab(tabs: List[str]) -> str:
+    """Renders a horizontal tab selector and returns the selected tab, unlike
+    streamlit tabs only the selected tab's content needs to be computed"""
+    return streamlit.radio(
+        "Tab", tabs, horizontal=True, key="active_tab", label_visibility="collapsed"
+    )
+
+
 def sep():
     """Renders a horizontal separator"""
     streamlit.markdown("---")
@@ -39,6 +62,9 @@ def render_card(
     icon="fa-globe",
 ):
     """Renders a custom KPI card with optional icon and progress-bar"""
+    # imported on first use, keeps it out of the worker's start up
+    from streamlit_kpi import streamlit_kpi as card
+
     the_card = card(
         key=key,
         title=title,
@@ -64,6 +90,23 @@ def download_file(btn_label, data, file_name, mime_type):
     )
 
 
+def plotly_chart(fig, **kwargs):
+    """Renders a plotly figure with a compacted payload, see __compact_figure. The
+    bytes sent are counted per figure and per rerun if perf stats are enabled."""
+    fig = __compact_figure(fig)
+    if app_config.show_perf_stats:
+        payload = streamlit.session_state.setdefault("payload_bytes", {})
+        name = fig.layout.title.text or f"figure {len(payload) + 1}"
+        payload[name] = len(json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder))
+    streamlit.plotly_chart(fig, **kwargs)
+
+
+def pop_payload_stats() -> dict:
+    """Figure bytes sent by plotly_chart since the last call, with their total"""
+    payload = streamlit.session_state.pop("payload_bytes", {})
+    return {"total": sum(payload.values()), "figures": payload}
+
+
 def show_questions(questions: List[str]):
     q = "QUESTIONS:\n" + "\n".join(questions)
     streamlit.info(q, icon=app_config.icon_question)
@@ -74,9 +117,187 @@ def show_insights(insights: List[str]):
     streamlit.warning(a, icon=app_config.icon_insight)
 
 
+def spinner(text: str):
+    """streamlit spinner while the block runs, a no-op without text or outside of a
+    script run (e.g. in the warm-up thread)"""
+    if not text or get_script_run_ctx(suppress_warning=True) is None:
+        return contextlib.nullcontext()
+    return streamlit.spinner(text)
+
+
+def show_perf_stats(title: str, stats: dict):
+    """Renders performance counters in the sidebar, if enabled in app config"""
+    if not app_config.show_perf_stats:
+        return
+    with streamlit.sidebar.expander(f"Performance: {title}"):
+        streamlit.json(stats)
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache, bounded by the total size in bytes of
+    its values as reported by sizeof. Counts hits and misses."""
+
+    def __init__(self, max_bytes: int, sizeof=sys.getsizeof):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.__items = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.__lock:
+            if key not in self.__items:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self.__items.move_to_end(key)
+            return self.__items[key][0]
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        # would evict everything else and still not fit
+        if size > self.max_bytes:
+            return
+        with self.__lock:
+            if key in self.__items:
+                self.nbytes -= self.__items.pop(key)[1]
+            self.__items[key] = (value, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted_size) = self.__items.popitem(last=False)
+                self.nbytes -= evicted_size
+
+    def clear(self):
+        with self.__lock:
+            self.__items.clear()
+            self.nbytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.__items),
+            "bytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def shared_resource(max_entries: int = None, show_spinner: str = None):
+    """Process-wide cache of a function's results by its arguments, arguments named
+    with a leading underscore aren't part of the key (as with st.cache_resource).
+    Unlike st.cache_resource it works without a script run context, so the warm-up
+    thread can fill it, and concurrent calls with the same key wait for the first one
+    instead of computing the result again. The least recently used entry is dropped
+    beyond max_entries."""
+
+    def decorator(func):
+        signature = inspect.signature(func)
+        results = OrderedDict()
+        key_locks = {}
+        lock = threading.Lock()
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            arguments = signature.bind(*args, **kwargs).arguments
+            key = tuple(
+                (name, value)
+                for name, value in arguments.items()
+                if not name.startswith("_")
+            )
+            with lock:
+                if key in results:
+                    results.move_to_end(key)
+                    return results[key]
+                key_lock = key_locks.setdefault(key, threading.Lock())
+            # one call computes the result, the others wait for it
+            with spinner(show_spinner), key_lock:
+                with lock:
+                    if key in results:
+                        return results[key]
+                result = func(*args, **kwargs)
+                with lock:
+                    results[key] = result
+                    key_locks.pop(key, None)
+                    while max_entries and len(results) > max_entries:
+                        results.popitem(last=False)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
 ### module's internal/private functions
+def __compact_figure(fig):
+    """Shrinks the figure's JSON: template styles of trace types the figure doesn't
+    use are dropped, floats are rounded to app_config.figure_float_decimals and
+    numeric arrays are stored with the smallest dtype, as plotly serializes numpy
+    arrays as typed (base64) arrays"""
+    trace_types = {trace.type for trace in fig.data}
+    template_data = fig.layout.template.data.to_plotly_json()
+    fig.layout.template.data = {
+        trace_type: styles
+        for trace_type, styles in template_data.items()
+        if trace_type in trace_types
+    }
+    for trace in fig.data:
+        trace.update(__compact_arrays(trace.to_plotly_json()))
+    return fig
+
+
+def __compact_arrays(props: dict) -> dict:
+    """Compacted numeric arrays of the (nested) trace properties"""
+    compacted = {}
+    for key, value in props.items():
+        if isinstance(value, dict) and "bdata" in value:
+            # typed array as read by plotly.io.from_json
+            shape = [int(n) for n in value.get("shape", "-1").split(",") if n.strip()]
+            value = np.frombuffer(
+                base64.b64decode(value["bdata"]), value["dtype"]
+            ).reshape(shape)
+        if isinstance(value, dict):
+            value = __compact_arrays(value)
+            if value:
+                compacted[key] = value
+        elif isinstance(value, (list, tuple, np.ndarray)) and len(value):
+            array = np.asarray(value)
+            if array.dtype.kind in "iuf":
+                compacted[key] = __compact_array(array)
+    return compacted
+
+
+def __compact_array(array: np.ndarray) -> np.ndarray:
+    """Rounded floats, integers (or integral floats) in the smallest integer type"""
+    if array.dtype.kind == "f":
+        if not np.isfinite(array).all():
+            return array
+        decimals = app_config.figure_float_decimals
+        array = array.round(decimals)
+        if (array != np.floor(array)).any():
+            # float32 still tells apart the rounded values below this magnitude
+            if np.abs(array).max() < 2**23 / 10**decimals:
+                return array.astype("float32")
+            return array
+    low, high = array.min(), array.max()
+    for dtype in ("int8", "int16", "int32"):
+        if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+            return array.astype(dtype)
+    return array
+
+
 def __set_banner_title(banner, title):
-    image = Image.open(banner)
-    image = image.resize((image.width, 150), resample=Image.Resampling.NEAREST)
-    streamlit.image(image=image)
+    streamlit.image(image=load_banner(banner))
     streamlit.title(title)
+
+
+@shared_resource(max_entries=4)
+def __resized_banner(banner: str, mtime_ns: int):
+    """Banner image resized once per file version instead of on every rerun"""
+    from PIL import Image
+
+    image = Image.open(banner)
+    return image.resize((image.width, 150), resample=Image.Resampling.NEAREST)
@@ -0,0 +1,83 @@
+"""Warm-up of the process-wide caches. When the app is first imported by the server,
+a background thread resizes the banner, loads the data, builds the filter catalog
+and index, the aggregate cube and the figures of all tabs for the unfiltered view,
+in the order of a script run. A script run needing an entry still being built waits
+for it instead of building it again."""
+
+import sys
+import threading
+import time
+
+import aggregates
+import data
+import filters
+import tab_attrition
+import tab_capacity
+import tab_summary
+import utils
+from config import app_config
+
+__LOCK = threading.Lock()
+__STARTED = False
+# step -> wall time in ms, filled in as the warm-up progresses
+__TIMINGS = {}
+# figure build -> wall time in ms
+__FIGURE_TIMINGS = {}
+
+
+def start(file: str = app_config.data_file):
+    """Starts the warm-up of the data file in a background thread, once per server
+    process"""
+    global __STARTED
+    with __LOCK:
+        if __STARTED:
+            return
+        __STARTED = True
+    threading.Thread(target=run, args=(file,), name="warm-up", daemon=True).start()
+
+
+def run(file: str = app_config.data_file):
+    """Fills the caches read by a script run of the unfiltered view. Only caches that
+    work without a script run context are used (utils.shared_resource and module
+    level caches), no st.cache_* function nor session state."""
+    __timed(__TIMINGS, "banner", utils.load_banner, app_config.banner_image)
+    df = __timed(__TIMINGS, "data", data.load_transform_cached, file)
+    __timed(__TIMINGS, "filter catalog", data.get_filter_catalog, df)
+    __timed(__TIMINGS, "filter index", filters.get_filter_index, df)
+    kpis = __timed(__TIMINGS, "cube", aggregates.slice_cube, df, df)
+    tasks = {}
+    for tab in (tab_summary, tab_capacity, tab_attrition):
+        tasks.update(tab.figure_tasks(df, kpis))
+    for name, task in tasks.items():
+        __timed(__FIGURE_TIMINGS, name, task)
+
+
+def get_timings() -> dict:
+    """Wall time in ms of each warm-up step and figure build done so far, with their
+    total"""
+    with __LOCK:
+        timings = dict(__TIMINGS, figures=dict(__FIGURE_TIMINGS))
+    total = sum(__TIMINGS.values()) + sum(timings["figures"].values())
+    return dict(timings, total=round(total, 2))
+
+
+### module's internal functions
+def __timed(timings: dict, step: str, func, *args):
+    start_time = time.perf_counter()
+    result = func(*args)
+    with __LOCK:
+        timings[step] = round((time.perf_counter() - start_time) * 1000, 2)
+    return result
+
+
+if __name__ == "__main__":
+    # usage: python src/warmup.py [csv-file]
+    # e.g. as a deploy step, writes the data snapshot read by the app's first load
+    # and reports the cost of each warm-up step
+    run(sys.argv[1] if len(sys.argv) > 1 else app_config.data_file)
+    for name, ms in {**__TIMINGS, **__FIGURE_TIMINGS}.items():
+        print(f"{name:>24}: {ms:10.2f} ms")
+    print(f"{'total':>24}: {get_timings()['total']:10.2f} ms")
+elif app_config.warm_up:
+    # imported by the app, i.e. when the server runs its first script
+    start()